@@ -1,7 +1,9 @@
+import click
 from flask import Flask
 from flask_migrate import Migrate
 from .models import db
 from .config import Config
+from .suggest import build_suggest_index
 import re
 
 def format_bucket(value):
@@ -43,10 +45,26 @@ def create_app():
 
     with app.app_context():
         db.create_all()  # Create sql tables for our data models
+        
+        # Build the type-ahead index once; forked gunicorn workers inherit it (--preload).
+        # Not for CLI commands (import-worker, db upgrade, ...): they run inside a click context.
+        if app.config.get('SUGGEST_INDEX_AT_STARTUP') and click.get_current_context(silent=True) is None:
+            try:
+                build_suggest_index()
+            except Exception as e:
+                app.logger.warning(f"Suggest index not built at startup, building on first use: {e}")
 
     from .routes import main
     app.register_blueprint(main)
     
+    # Register CLI commands (flask import-worker, flask bizzy-cache-stats, flask purge-deleted)
+    from .jobs import register_commands as register_job_commands
+    from .bizzy_cache import register_commands as register_cache_commands
+    from .purge import register_commands as register_purge_commands
+    register_job_commands(app)
+    register_cache_commands(app)
+    register_purge_commands(app)
+    
     # Register custom Jinja2 filter
     app.jinja_env.filters['bucket'] = format_bucket
 
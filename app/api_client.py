@@ -1,65 +1,316 @@
 import requests
-import re
+import os
+import json
+import threading
+import time
+import random
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from flask import current_app
 from datetime import datetime
+from .bizzy_cache import (
+    get_cache_entry, is_fresh, store_cache_entry,
+    get_negative_entry, record_negative_hit, store_negative_entry
+)
+from .vat import clean_vat_number
 
-def clean_vat_number(vat_number):
-    """Clean VAT number according to Belgian format"""
-    # Extract only digits
-    digits = re.sub(r"\D", "", vat_number)
+BIZZY_BASE_URL = "https://api.bizzy.ai/v1"
+
+
+# =====================================================
+# RESILIENCE (RETRIES + CIRCUIT BREAKER)
+# =====================================================
+
+# Responses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class BizzyUnavailable(requests.RequestException):
+    """bizzy.ai could not be reached: circuit breaker open or retries exhausted"""
+
+
+class NoFinancialsError(ValueError):
+    """The company exists but bizzy.ai has no financial accounts for it"""
+
+
+class CircuitBreaker:
+    """Process-wide breaker: after repeated failures, fail fast until reset_timeout passed"""
+    
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
     
-    # Belgian VAT: 10 digits where first is 0 → strip it to 9 digits
-    if len(digits) == 10 and digits.startswith("0"):
-        return digits[1:]  # 9 digits
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
     
-    # New format: starts with 1, keep all 10 digits
-    if len(digits) == 10 and digits.startswith("1"):
-        return digits  # 10 digits
+    def allow_request(self):
+        """Closed: always. Half-open: a single trial request. Open: never."""
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
     
-    # Already 9 digits (0 was already stripped)
-    if len(digits) == 9:
-        return digits
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
     
-    raise ValueError(f"Ongeldig Belgisch BTW-nummer: {vat_number}")
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                # A failed half-open trial re-opens the breaker for another reset_timeout
+                self.opened_at = time.monotonic()
 
-def get_company_details(clean_vat, api_key):
-    """Fetch company details from bizzy.ai Details API"""
-    url = f"https://api.bizzy.ai/v1/companies/BE/{clean_vat}"
+
+def parse_retry_after(value):
+    """Retry-After header (seconds or HTTP date) as seconds, or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# =====================================================
+# HTTP CLIENT
+# =====================================================
+
+class BizzyClient:
+    """Keep-alive HTTP client for the bizzy.ai API (one per process)"""
     
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Accept": "application/json"
-    }
+    def __init__(self, api_key, base_url=BIZZY_BASE_URL, pool_size=10, timeout=(5, 30), record_dir=None,
+                 max_retries=3, backoff_base=0.5, backoff_max=10, breaker=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.record_dir = record_dir
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        
+        # One pooled session: TCP/TLS connections are reused between calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Accept": "application/json"
+        })
     
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
+    def get(self, path):
+        """GET a bizzy.ai path and return the decoded JSON body
+        
+        Transport errors (connection, timeout, broken response body), 429 and
+        5xx responses are retried with jittered exponential backoff (honouring
+        Retry-After). Other HTTP errors, such as 404, are raised immediately.
+        """
+        if not self.breaker.allow_request():
+            raise BizzyUnavailable("bizzy.ai is tijdelijk niet bereikbaar, probeer later opnieuw")
+        
+        answered = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                retry_after = None
+                try:
+                    response = self.session.get(f"{self.base_url}{path}", timeout=self.timeout)
+                except requests.RequestException as e:
+                    error = e
+                else:
+                    if self.record_dir:
+                        self.record(path, response)
+                    
+                    if response.status_code not in RETRY_STATUSES:
+                        # The API answered (even a 404 means it is healthy)
+                        answered = True
+                        self.breaker.record_success()
+                        response.raise_for_status()
+                        return response.json()
+                    
+                    try:
+                        response.raise_for_status()
+                    except requests.HTTPError as e:
+                        error = e
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                
+                if attempt == self.max_retries:
+                    break
+                
+                delay = self.backoff_delay(attempt, retry_after)
+                if delay is None:
+                    break  # Server asks us to wait longer than we are willing to block
+                time.sleep(delay)
+        finally:
+            # Every way out without an answer counts as a failure, so a half-open trial always ends
+            if not answered:
+                self.breaker.record_failure()
+        
+        raise BizzyUnavailable(f"bizzy.ai niet bereikbaar na {attempt + 1} pogingen: {error}")
+    
+    def backoff_delay(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff; Retry-After is a lower bound, None means give up"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            if retry_after > self.backoff_max:
+                return None
+            delay = max(delay, retry_after)
+        return delay
     
-    return response.json()
+    def record(self, path, response):
+        """Save a response as a fixture for the fake bizzy.ai server (bench/fake_bizzy.py)"""
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        
+        # /companies/BE/0123/financials -> companies_BE_0123_financials.json
+        filename = path.strip("/").replace("/", "_") + ".json"
+        os.makedirs(self.record_dir, exist_ok=True)
+        with open(os.path.join(self.record_dir, filename), "w", encoding="utf-8") as f:
+            json.dump({"status": response.status_code, "body": body}, f, indent=2)
+
 
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
 
-def get_company_financials(vat_number):
-    """Fetch comprehensive company data from bizzy.ai API (Details + Financials)"""
+
+def get_bizzy_client():
+    """Return the process-wide BizzyClient, creating it on first use"""
+    global _client, _client_pid
+    
     api_key = current_app.config.get('BIZZY_API_KEY')
     if not api_key:
         raise ValueError("BIZZY_API_KEY not configured")
     
+    with _client_lock:
+        # Sessions must not be shared across forked gunicorn workers
+        if _client is None or _client_pid != os.getpid():
+            _client = BizzyClient(
+                api_key,
+                base_url=current_app.config.get('BIZZY_BASE_URL', BIZZY_BASE_URL),
+                pool_size=current_app.config.get('BIZZY_POOL_SIZE', 10),
+                timeout=(
+                    current_app.config.get('BIZZY_CONNECT_TIMEOUT', 5),
+                    current_app.config.get('BIZZY_READ_TIMEOUT', 30)
+                ),
+                record_dir=current_app.config.get('BIZZY_RECORD_DIR'),
+                max_retries=current_app.config.get('BIZZY_MAX_RETRIES', 3),
+                backoff_base=current_app.config.get('BIZZY_BACKOFF_BASE', 0.5),
+                backoff_max=current_app.config.get('BIZZY_BACKOFF_MAX', 10),
+                breaker=CircuitBreaker(
+                    failure_threshold=current_app.config.get('BIZZY_BREAKER_THRESHOLD', 5),
+                    reset_timeout=current_app.config.get('BIZZY_BREAKER_RESET', 30)
+                )
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+def fetch_company_raw(clean_vat):
+    """Fetch Details and Financials concurrently, returns (details_data, financials_data)"""
+    client = get_bizzy_client()
+    
+    # Financials runs on a helper thread while Details runs on this one
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        financials_future = executor.submit(client.get, f"/companies/BE/{clean_vat}/financials")
+        try:
+            details_data = client.get(f"/companies/BE/{clean_vat}")
+        except Exception:
+            # Details errors win, just like when the calls were sequential
+            financials_future.cancel()
+            raise
+        financials_data = financials_future.result()
+    
+    return details_data, financials_data
+
+
+def cached_company_financials(vat_number):
+    """Company data from the bizzy_cache table, or None when it has to be fetched from bizzy.ai
+    
+    Raises ValueError for a VAT in the negative cache (unknown VAT, no financials).
+    """
+    clean_vat = clean_vat_number(vat_number)
+    
+    # Known failures (unknown VAT, no financials) are not retried until they expire
+    negative = get_negative_entry(clean_vat)
+    if negative is not None:
+        record_negative_hit(negative)
+        raise ValueError(negative.message)
+    
+    entry = get_cache_entry(clean_vat)
+    if entry is not None and is_fresh(entry):
+        return parse_company_data(clean_vat, entry.details, entry.financials)
+    return None
+
+
+def get_company_financials(vat_number, use_cache=True):
+    """Fetch comprehensive company data from bizzy.ai API (Details + Financials)
+    
+    With use_cache, cached_company_financials is tried first. When bizzy.ai is
+    unavailable, a stale cache entry is used if there is one. Unknown VATs and
+    companies without financials are remembered in the negative cache
+    (BIZZY_NEGATIVE_CACHE_TTL). Nothing is committed here: callers that must not
+    hold a transaction during retries end it after cached_company_financials and
+    call this with use_cache=False.
+    """
     # Clean VAT number using proper Belgian format
     clean_vat = clean_vat_number(vat_number)
     
-    # Call Details endpoint
-    details_data = get_company_details(clean_vat, api_key)
+    if use_cache:
+        company_data = cached_company_financials(clean_vat)
+        if company_data is not None:
+            return company_data
     
-    # Call Financials endpoint
-    financials_url = f"https://api.bizzy.ai/v1/companies/BE/{clean_vat}/financials"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Accept": "application/json"
-    }
+    try:
+        details_data, financials_data = fetch_company_raw(clean_vat)
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            store_negative_entry(clean_vat, 'not_found', str(e))
+        raise
+    except BizzyUnavailable:
+        # bizzy.ai is down: stale data beats no data
+        entry = get_cache_entry(clean_vat)
+        if entry is None:
+            raise
+        current_app.logger.warning(f"bizzy.ai unavailable, serving cached data for {clean_vat} from {entry.fetched_at}")
+        return parse_company_data(clean_vat, entry.details, entry.financials)
     
-    financials_response = requests.get(financials_url, headers=headers)
-    financials_response.raise_for_status()
-    financials_data = financials_response.json()
+    try:
+        company_data = parse_company_data(clean_vat, details_data, financials_data)
+    except NoFinancialsError as e:
+        store_negative_entry(clean_vat, 'no_financials', str(e))
+        raise
     
+    store_cache_entry(clean_vat, details_data, financials_data)
+    return company_data
+
+
+def parse_company_data(clean_vat, details_data, financials_data):
+    """Map raw Details + Financials JSON onto our Company model fields"""
     # Extract company info from Details endpoint
     details = details_data.get("data", {})
     identifier = details_data.get("identifier", {})
@@ -100,7 +351,7 @@ def get_company_financials(vat_number):
     # Get most recent financial data
     accounts = financials_data.get("data", [])
     if not accounts:
-        raise ValueError(f"Bedrijf '{company_name}' gevonden, maar geen financiële gegevens beschikbaar")
+        raise NoFinancialsError(f"Bedrijf '{company_name}' gevonden, maar geen financiële gegevens beschikbaar")
     
     latest_account = max(accounts, key=lambda x: x.get("startDate", ""))
     
@@ -0,0 +1,189 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+from flask import current_app
+from sqlalchemy import tuple_
+from sqlalchemy.orm import contains_eager
+from .models import db, Case, Company, QUICK_RATIO_SORT_KEY, CASH_SORT_KEY, SOLVENCY_SORT_KEY
+from .scoring import WEIGHT_PROFILES, batch_metrics, composite_scores, rank_cases
+from .route_planner import geocode_address, geocode_postal_code, plan_route, route_distance
+
+# Sort options for a batch, all DESC with missing values last
+BATCH_SORTS = {
+    'visit': (QUICK_RATIO_SORT_KEY, CASH_SORT_KEY),  # Quick ratio, then cash
+    'score': (SOLVENCY_SORT_KEY,),  # Solvency score
+}
+# Any WEIGHT_PROFILES name ('balanced', 'liquidity', ...) is also a valid sort, ranked in scoring.py,
+# and 'route' orders the batch as a planned visit route (see batch_route)
+
+
+def sort_keys(sort):
+    """Sort keys for a BATCH_SORTS name plus case_id as tie-breaker (unknown names sort by visit order)"""
+    return BATCH_SORTS.get(sort, BATCH_SORTS['visit']) + (Case.case_id,)
+
+
+def batch_cases_query(batch_id, sort='visit'):
+    """Cases of a batch with their company, in visit order (or by solvency score)"""
+    return Case.query.join(Case.company).options(
+        contains_eager(Case.company)
+    ).filter(
+        Case.batch_id == batch_id
+    ).order_by(*[key.desc() for key in sort_keys(sort)])
+
+
+def cases_by_id(case_ids):
+    """Cases (with company) for case_ids, in that order"""
+    if not case_ids:
+        return []
+    cases = Case.query.join(Case.company).options(
+        contains_eager(Case.company)
+    ).filter(Case.case_id.in_(case_ids)).all()
+    by_id = {case.case_id: case for case in cases}
+    return [by_id[case_id] for case_id in case_ids if case_id in by_id]
+
+
+def ordered_case_ids(batch_id, sort):
+    """case_ids of a batch for the sorts that are not done in SQL"""
+    if sort == 'route':
+        route = batch_route(batch_id)
+        return route.case_ids if route else batch_metrics(batch_id).case_ids  # Too large: visit order
+    case_ids, _ = rank_cases(batch_metrics(batch_id), sort)
+    return case_ids
+
+
+def batch_cases(batch_id, sort='visit'):
+    """All cases of a batch, sorted in SQL, ranked by a weight profile or as a route"""
+    if sort in WEIGHT_PROFILES or sort == 'route':
+        return cases_by_id(ordered_case_ids(batch_id, sort))
+    return batch_cases_query(batch_id, sort).all()
+
+
+def ranked_cases_page(batch_id, sort, after=None, limit=100):
+    """batch_cases_page for a weight profile or route: order the whole batch, load one slice"""
+    case_ids = ordered_case_ids(batch_id, sort)
+    start = 0
+    if after is not None:
+        if after not in case_ids:
+            return [], None
+        start = case_ids.index(after) + 1
+    
+    page_ids = case_ids[start:start + limit]
+    next_cursor = page_ids[-1] if start + limit < len(case_ids) else None
+    return cases_by_id(page_ids), next_cursor
+
+
+def batch_cases_page(batch_id, after=None, limit=100, sort='visit'):
+    """One page of batch cases using keyset pagination
+    
+    after is the case_id of the last case on the previous page. Returns
+    (cases, next_cursor); next_cursor is None on the last page.
+    """
+    if sort in WEIGHT_PROFILES or sort == 'route':
+        return ranked_cases_page(batch_id, sort, after=after, limit=limit)
+    
+    keys = sort_keys(sort)
+    query = batch_cases_query(batch_id, sort)
+    
+    if after is not None:
+        cursor = db.session.query(*keys).join(Case.company).filter(
+            Case.batch_id == batch_id,
+            Case.case_id == after
+        ).first()
+        if cursor is None:
+            return [], None
+        # Everything that sorts after the cursor row (all keys descending)
+        query = query.filter(tuple_(*keys) < tuple_(*cursor))
+    
+    # One extra row tells us whether there is a next page
+    cases = query.limit(limit + 1).all()
+    next_cursor = cases[limit - 1].case_id if len(cases) > limit else None
+    return cases[:limit], next_cursor
+
+
+def batch_score_counts(batch_id):
+    """Number of cases per common_score (A-E, None) in a batch"""
+    return dict(
+        db.session.query(Company.common_score, db.func.count(Case.case_id)).join(Case.company).filter(
+            Case.batch_id == batch_id
+        ).group_by(Company.common_score).all()
+    )
+
+
+# =====================================================
+# VISIT ROUTE
+# =====================================================
+
+def route_too_large(case_count):
+    """True when a batch has more cases than the route planner takes (ROUTE_MAX_STOPS)"""
+    return case_count > current_app.config.get('ROUTE_MAX_STOPS', 500)
+
+
+def batch_sort(batch_id, sort):
+    """sort, or 'visit' for a route of a batch that is too large to plan"""
+    if sort == 'route' and route_too_large(Case.query.filter_by(batch_id=batch_id).count()):
+        return 'visit'
+    return sort
+
+
+BatchRoute = namedtuple('BatchRoute', ['case_ids', 'distance_km', 'located', 'unlocated'])
+
+# Planned routes by input fingerprint: pages of the scroll feed must see the same
+# order, and the solver has a time limit so large batches are not deterministic
+ROUTE_CACHE_SIZE = 32
+_route_cache = OrderedDict()
+_route_cache_lock = threading.Lock()
+
+
+def batch_route(batch_id):
+    """Plan the day route for a batch: geocode the addresses, weigh distance against priority
+    
+    Priority is the liquidity profile from scoring.py, so liquid debtors still
+    come early. Cases without a known postal code go last, by priority.
+    Returns None for a batch above ROUTE_MAX_STOPS.
+    """
+    metrics = batch_metrics(batch_id)
+    if route_too_large(len(metrics.case_ids)):
+        return None
+    addresses = dict(db.session.query(Case.case_id, Company.company_address).join(Case.company).filter(
+        Case.batch_id == batch_id
+    ).all())
+    priorities = composite_scores(metrics, WEIGHT_PROFILES['liquidity']) / 100
+    priority_weight = current_app.config.get('ROUTE_PRIORITY_WEIGHT', 0.5)
+    start = geocode_postal_code(current_app.config.get('ROUTE_START_POSTAL_CODE'))
+    
+    fingerprint = hashlib.sha1(repr((
+        batch_id, metrics.case_ids, [addresses.get(case_id) for case_id in metrics.case_ids],
+        priorities.round(6).tolist(), priority_weight, start
+    )).encode()).hexdigest()
+    with _route_cache_lock:
+        if fingerprint in _route_cache:
+            _route_cache.move_to_end(fingerprint)
+            return _route_cache[fingerprint]
+    
+    located, coordinates, unlocated = [], [], []
+    for i, case_id in enumerate(metrics.case_ids):
+        point = geocode_address(addresses.get(case_id))
+        if point is None:
+            unlocated.append(i)
+        else:
+            located.append(i)
+            coordinates.append(point)
+    
+    order = plan_route(
+        np.array(coordinates), priorities[located], priority_weight=priority_weight, start=start,
+        time_limit=current_app.config.get('ROUTE_TIME_LIMIT', 0.8)
+    )
+    unlocated.sort(key=lambda i: -priorities[i])
+    
+    route = BatchRoute(
+        case_ids=[metrics.case_ids[located[i]] for i in order] + [metrics.case_ids[i] for i in unlocated],
+        distance_km=round(route_distance(np.array(coordinates), order, start=start), 1),
+        located=len(located),
+        unlocated=len(unlocated)
+    )
+    with _route_cache_lock:
+        _route_cache[fingerprint] = route
+        while len(_route_cache) > ROUTE_CACHE_SIZE:
+            _route_cache.popitem(last=False)
+    return route
@@ -0,0 +1,81 @@
+import click
+from datetime import datetime, timedelta
+from flask import current_app
+from .models import db, BizzyCache, BizzyNegativeCache
+
+
+def get_cache_entry(clean_vat):
+    """Return the cached bizzy.ai responses for a cleaned VAT, or None"""
+    return db.session.get(BizzyCache, clean_vat)
+
+
+def is_fresh(entry):
+    """Check whether a cache entry is younger than BIZZY_CACHE_TTL"""
+    ttl = current_app.config.get('BIZZY_CACHE_TTL', 24 * 3600)
+    return entry.fetched_at >= datetime.utcnow() - timedelta(seconds=ttl)
+
+
+def store_cache_entry(clean_vat, details_data, financials_data):
+    """Insert or refresh the cache entry (committed together with the caller's work)"""
+    entry = get_cache_entry(clean_vat)
+    if entry is None:
+        entry = BizzyCache(vat=clean_vat)
+        db.session.add(entry)
+    
+    entry.details = details_data
+    entry.financials = financials_data
+    entry.fetched_at = datetime.utcnow()
+    return entry
+
+
+# =====================================================
+# NEGATIVE CACHE
+# =====================================================
+
+def get_negative_entry(clean_vat):
+    """Return a fresh negative cache entry for a cleaned VAT (any reason), or None"""
+    ttl = current_app.config.get('BIZZY_NEGATIVE_CACHE_TTL', 6 * 3600)
+    return BizzyNegativeCache.query.filter(
+        BizzyNegativeCache.vat == clean_vat,
+        BizzyNegativeCache.created_at >= datetime.utcnow() - timedelta(seconds=ttl)
+    ).first()
+
+
+def record_negative_hit(entry):
+    """Count a negative cache hit (atomic increment, committed with the caller's work)"""
+    BizzyNegativeCache.query.filter_by(vat=entry.vat, reason=entry.reason).update(
+        {BizzyNegativeCache.hits: BizzyNegativeCache.hits + 1},
+        synchronize_session=False
+    )
+
+
+def store_negative_entry(clean_vat, reason, message):
+    """Remember a failed lookup; an expired entry for the same reason is restarted"""
+    entry = db.session.get(BizzyNegativeCache, (clean_vat, reason))
+    if entry is None:
+        entry = BizzyNegativeCache(vat=clean_vat, reason=reason, hits=0)
+        db.session.add(entry)
+    
+    entry.message = message
+    entry.created_at = datetime.utcnow()
+    return entry
+
+
+def register_commands(app):
+    """Register the cache CLI commands on the app"""
+    
+    @app.cli.command("bizzy-cache-stats")
+    @click.option("--top", default=10, help="Number of most-hit VATs to list")
+    def bizzy_cache_stats(top):
+        """Show bizzy.ai cache sizes and negative cache hit counts"""
+        click.echo(f"Cached companies: {BizzyCache.query.count()}")
+        
+        for reason, entries, hits in db.session.query(
+            BizzyNegativeCache.reason,
+            db.func.count(),
+            db.func.coalesce(db.func.sum(BizzyNegativeCache.hits), 0)
+        ).group_by(BizzyNegativeCache.reason):
+            click.echo(f"Negative cache '{reason}': {entries} VATs, {hits} API calls saved")
+        
+        for entry in BizzyNegativeCache.query.order_by(BizzyNegativeCache.hits.desc()).limit(top):
+            click.echo(f"  BE{entry.vat:0>10}  {entry.reason:<14} {entry.hits} hits")
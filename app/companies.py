@@ -0,0 +1,256 @@
+import hashlib
+import threading
+import uuid
+from contextlib import contextmanager
+from flask import current_app
+from sqlalchemy import text
+from .models import db, Company, SOLVENCY_SORT_KEY, solvency_score
+from .api_client import cached_company_financials, get_company_financials
+from .vat import clean_vat_number
+from .singleflight import SingleFlight
+from .suggest import add_after_commit
+
+# Company columns filled from the bizzy.ai data returned by get_company_financials
+COMPANY_FIELDS = [
+    'company_name', 'company_address', 'established_since',
+    'revenue_estimation', 'employee_estimation', 'common_score',
+    'credit_limit', 'credit_score', 'solvency_ratio', 'debt_ratio',
+    'current_ratio', 'quick_ratio', 'cash', 'ebitda', 'net_profit',
+    'total_assets', 'equity', 'total_debt'
+]
+
+
+# Concurrent lookups of the same VAT within this process share one fetch
+company_fetches = SingleFlight()
+
+
+def advisory_key(namespace, vat_number):
+    """Stable signed 64-bit Postgres advisory lock key per VAT"""
+    return int.from_bytes(hashlib.sha1(f"{namespace}:{vat_number}".encode()).digest()[:8], "big", signed=True)
+
+
+def lock_company_vat(vat_number):
+    """Serialize writers of one VAT across gunicorn workers (Postgres advisory lock, released on commit)"""
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    
+    db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": advisory_key("company", vat_number)})
+
+
+@contextmanager
+def company_fetch_lock(vat_number):
+    """Let one gunicorn worker at a time fetch a VAT from bizzy.ai, yields True when it had to wait
+    
+    A session-level advisory lock on a dedicated autocommit connection: it is held
+    for the whole fetch without keeping a transaction open. Its key differs from
+    lock_company_vat, which the holder takes again for the write.
+    """
+    bind = db.session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        yield False
+        return
+    
+    key = advisory_key("company-fetch", vat_number)
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        waited = not connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        if waited:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+        try:
+            yield waited
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+
+
+def upsert_company(vat_number, api_data):
+    """Find or create the Company for vat_number and update it with API data"""
+    lock_company_vat(vat_number)
+    
+    # A deleted company keeps its VAT number (unique): fetching it again brings it back
+    company = Company.query.filter_by(vat_number=vat_number).execution_options(include_deleted=True).first()
+    if not company:
+        company = Company(vat_number=vat_number)
+    
+    for field in COMPANY_FIELDS:
+        setattr(company, field, api_data.get(field))
+    company.deleted_at = None
+    
+    db.session.add(company)
+    db.session.flush()
+    
+    # Keep the type-ahead index in this process up to date (after the commit)
+    add_after_commit(db.session, company.company_id, company.company_name, company.vat_number)
+    return company
+
+
+def dialect_insert(table):
+    """INSERT construct with ON CONFLICT support for the current database (Postgres, or SQLite locally)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def bulk_upsert_companies(companies_data):
+    """Insert or update many companies in one statement, returns ({vat_number: company_id}, changed_ids)
+    
+    companies_data maps vat_number -> get_company_financials dict. Existing rows
+    are only rewritten when a value differs; changed_ids are the existing
+    companies that were. Core statements skip the ORM events, so solvency_score
+    is computed here. Deleted companies are restored.
+    """
+    if not companies_data:
+        return {}, set()
+    
+    # One IN lookup instead of a query per VAT; unchanged rows are not returned by the upsert
+    company_ids = dict(db.session.query(Company.vat_number, Company.company_id).filter(
+        Company.vat_number.in_(list(companies_data))
+    ).execution_options(include_deleted=True))
+    existing_ids = set(company_ids.values())
+    
+    rows = []
+    for vat_number in sorted(companies_data):  # Same lock order for concurrent imports
+        values = {field: companies_data[vat_number].get(field) for field in COMPANY_FIELDS}
+        values['solvency_score'] = solvency_score(values['solvency_ratio'], values['debt_ratio'], values['credit_score'])
+        rows.append(dict(values, vat_number=vat_number, company_id=str(uuid.uuid4())))
+    
+    update_fields = COMPANY_FIELDS + ['solvency_score']
+    # executemany: SQLAlchemy sends the rows as multi-row VALUES batches ("insertmanyvalues")
+    statement = dialect_insert(Company.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Company.vat_number],
+        set_=dict({field: statement.excluded[field] for field in update_fields}, deleted_at=None),
+        where=db.or_(Company.deleted_at.isnot(None), *[
+            getattr(Company, field).is_distinct_from(statement.excluded[field]) for field in update_fields
+        ])
+    ).returning(Company.company_id, Company.vat_number, Company.company_name)
+    
+    changed_ids = set()
+    for company_id, vat_number, company_name in db.session.execute(statement, rows):
+        company_ids[vat_number] = company_id
+        if company_id in existing_ids:
+            changed_ids.add(company_id)
+        add_after_commit(db.session, company_id, company_name, vat_number)
+    
+    # Unchanged rows are not returned: a VAT another import inserted after the lookup above
+    # (with the same data) is still missing, fetch its id so its case is created
+    missing = [vat_number for vat_number in companies_data if vat_number not in company_ids]
+    if missing:
+        company_ids.update(db.session.query(Company.vat_number, Company.company_id).filter(
+            Company.vat_number.in_(missing)
+        ).execution_options(include_deleted=True))
+    
+    return company_ids, changed_ids
+
+
+def fetch_company(vat_number, use_cache=True):
+    """Fetch a company from bizzy.ai and store it, returns its company_id
+    
+    Threads asking for the same VAT share one upstream fetch via SingleFlight,
+    gunicorn workers via company_fetch_lock: a worker that waited on the lock
+    uses the bizzy_cache entry the holder just committed. No transaction is open
+    while waiting on the lock or on bizzy.ai (retries can take 30+ s).
+    """
+    clean_vat = clean_vat_number(vat_number)
+    
+    def fetch_and_store():
+        db.session.commit()  # Nothing stays open while waiting on the lock
+        with company_fetch_lock(clean_vat) as waited:
+            try:
+                api_data = cached_company_financials(clean_vat) if use_cache or waited else None
+                if api_data is None:
+                    db.session.commit()  # End the cache reads before calling bizzy.ai
+                    api_data = get_company_financials(clean_vat, use_cache=False)
+                company = upsert_company(vat_number, api_data)
+                db.session.commit()
+                return company.company_id
+            except Exception:
+                # Keep negative cache entries and hit counts written before the failure,
+                # committed before the lock is released so a waiting worker sees them
+                try:
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                raise
+    
+    return company_fetches.do(clean_vat, fetch_and_store)
+
+
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def refresh_company_in_background(vat_number):
+    """Re-fetch a company from bizzy.ai on a background thread and store the result"""
+    with _refreshing_lock:
+        if vat_number in _refreshing:
+            return  # A refresh for this VAT is already running
+        _refreshing.add(vat_number)
+    
+    app = current_app._get_current_object()
+    
+    def refresh():
+        with app.app_context():
+            try:
+                fetch_company(vat_number, use_cache=False)
+            except Exception as e:
+                app.logger.warning(f"Background refresh of {vat_number} failed: {e}")
+            finally:
+                with _refreshing_lock:
+                    _refreshing.discard(vat_number)
+    
+    threading.Thread(target=refresh, daemon=True).start()
+
+
+# =====================================================
+# NAME SEARCH
+# =====================================================
+
+_trigram_available = None
+
+
+def name_contains(column, query):
+    """Case-insensitive substring match; LIKE wildcards in query ('%', '_') match literally"""
+    pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return column.ilike(pattern, escape="\\")
+
+
+def trigram_search_available():
+    """True when the pg_trgm extension is installed (checked once per process)"""
+    global _trigram_available
+    if _trigram_available is None:
+        if db.session.get_bind().dialect.name != 'postgresql':
+            _trigram_available = False
+        else:
+            _trigram_available = db.session.execute(
+                text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            ).first() is not None
+    return _trigram_available
+
+
+def search_companies_by_name(query, page=1, per_page=25, sort='relevance'):
+    """Search companies by name, best matches first; returns (companies, has_next)
+    
+    With pg_trgm the GIN index serves both substring (ILIKE) and fuzzy (%)
+    matches, ranked by similarity. Without it we fall back to ILIKE sorted by name.
+    sort='score' orders the matches by stored solvency score instead.
+    """
+    substring_match = name_contains(Company.company_name, query)
+    
+    if trigram_search_available():
+        companies = Company.query.filter(substring_match | Company.company_name.op('%')(query))
+        relevance = db.func.similarity(Company.company_name, query).desc()
+    else:
+        companies = Company.query.filter(substring_match)
+        relevance = None
+    
+    if sort == 'score':
+        companies = companies.order_by(SOLVENCY_SORT_KEY.desc(), Company.company_name)
+    elif relevance is not None:
+        companies = companies.order_by(relevance, Company.company_name)
+    else:
+        companies = companies.order_by(Company.company_name)
+    
+    # One extra row tells us whether there is a next page
+    rows = companies.offset((page - 1) * per_page).limit(per_page + 1).all()
+    return rows[:per_page], len(rows) > per_page
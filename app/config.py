@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,4 +9,74 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ENGINE_OPTIONS = {"pool_pre_ping": True}
-    BIZZY_API_KEY = os.getenv("BIZZY_API_KEY")
\ No newline at end of file
+    BIZZY_API_KEY = os.getenv("BIZZY_API_KEY")
+    
+    # bizzy.ai HTTP client (pooled keep-alive session)
+    BIZZY_BASE_URL = os.getenv("BIZZY_BASE_URL", "https://api.bizzy.ai/v1")
+    BIZZY_POOL_SIZE = int(os.getenv("BIZZY_POOL_SIZE", "10"))
+    BIZZY_CONNECT_TIMEOUT = float(os.getenv("BIZZY_CONNECT_TIMEOUT", "5"))
+    BIZZY_READ_TIMEOUT = float(os.getenv("BIZZY_READ_TIMEOUT", "30"))
+    
+    # bizzy.ai response cache: entries younger than this are served without an API call
+    BIZZY_CACHE_TTL = int(os.getenv("BIZZY_CACHE_TTL", str(24 * 3600)))  # seconds
+    
+    # Number of concurrent bizzy.ai lookups during bulk enrichment (CSV import)
+    BIZZY_MAX_WORKERS = int(os.getenv("BIZZY_MAX_WORKERS", "8"))
+    
+    # Import worker: VATs enriched per progress update, seconds to wait when the queue is empty
+    IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "25"))
+    IMPORT_POLL_INTERVAL = float(os.getenv("IMPORT_POLL_INTERVAL", "2"))
+    
+    # A running import without heartbeat for this long is taken over by the next worker (crashed worker);
+    # the worker touches the heartbeat every quarter of this while a chunk is enriched
+    IMPORT_STALE_AFTER = int(os.getenv("IMPORT_STALE_AFTER", "600"))  # seconds
+    
+    # Soft delete: deleted companies, batches and cases are removed by `flask purge-deleted` after
+    # this many days, PURGE_BATCH_SIZE rows per transaction with PURGE_PAUSE seconds in between
+    SOFT_DELETE_RETENTION_DAYS = int(os.getenv("SOFT_DELETE_RETENTION_DAYS", "30"))
+    PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "500"))
+    PURGE_PAUSE = float(os.getenv("PURGE_PAUSE", "0.2"))  # seconds
+    
+    # Record mode: when set, every bizzy.ai response is saved as a fixture in this directory
+    BIZZY_RECORD_DIR = os.getenv("BIZZY_RECORD_DIR")
+    
+    # bizzy.ai resilience: retries with jittered exponential backoff, process-wide circuit breaker
+    BIZZY_MAX_RETRIES = int(os.getenv("BIZZY_MAX_RETRIES", "3"))
+    BIZZY_BACKOFF_BASE = float(os.getenv("BIZZY_BACKOFF_BASE", "0.5"))  # seconds
+    BIZZY_BACKOFF_MAX = float(os.getenv("BIZZY_BACKOFF_MAX", "10"))  # seconds, also the longest Retry-After we wait for
+    BIZZY_BREAKER_THRESHOLD = int(os.getenv("BIZZY_BREAKER_THRESHOLD", "5"))  # consecutive failures before opening
+    BIZZY_BREAKER_RESET = float(os.getenv("BIZZY_BREAKER_RESET", "30"))  # seconds before a trial request
+    
+    # Negative cache: unknown VATs and companies without financials are not re-fetched within this time
+    BIZZY_NEGATIVE_CACHE_TTL = int(os.getenv("BIZZY_NEGATIVE_CACHE_TTL", str(6 * 3600)))  # seconds
+    
+    # Dashboard name search: results per page and the hard limit on pages
+    SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "25"))
+    SEARCH_MAX_PAGES = int(os.getenv("SEARCH_MAX_PAGES", "20"))
+    
+    # Type-ahead suggestions: build the in-memory index at startup, re-sync new and deleted companies
+    # this often, rebuild it completely (renamed companies) this often (seconds)
+    SUGGEST_INDEX_AT_STARTUP = os.getenv("SUGGEST_INDEX_AT_STARTUP", "1") == "1"
+    SUGGEST_INDEX_MAX_AGE = int(os.getenv("SUGGEST_INDEX_MAX_AGE", "300"))
+    SUGGEST_INDEX_REBUILD_AGE = int(os.getenv("SUGGEST_INDEX_REBUILD_AGE", "3600"))
+    
+    # Maximum number of results for the debtor search on /debtors
+    DEBTOR_SEARCH_LIMIT = int(os.getenv("DEBTOR_SEARCH_LIMIT", "100"))
+    
+    # Cases per page on batch_detail (further pages load on scroll)
+    BATCH_PAGE_SIZE = int(os.getenv("BATCH_PAGE_SIZE", "100"))
+    
+    # Visit route planner (sort=route on a batch): km of detour accepted per position a
+    # fully liquid debtor moves forward, optional start postal code, solver time limit (s)
+    ROUTE_PRIORITY_WEIGHT = float(os.getenv("ROUTE_PRIORITY_WEIGHT", "0.5"))
+    ROUTE_START_POSTAL_CODE = os.getenv("ROUTE_START_POSTAL_CODE", "")
+    ROUTE_TIME_LIMIT = float(os.getenv("ROUTE_TIME_LIMIT", "0.8"))
+    
+    # Largest batch the route planner takes (n x n distance matrix in the web process); bigger batches use visit order
+    ROUTE_MAX_STOPS = int(os.getenv("ROUTE_MAX_STOPS", "500"))
+    
+    # Rendered batch PDFs are cached here (keyed by a hash of the batch content); empty disables the cache
+    PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "solvio-pdf-cache"))
+    
+    # Worker processes for PDF rendering (xhtml2pdf), outside the web process
+    PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
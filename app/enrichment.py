@@ -0,0 +1,44 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from .models import db
+from .api_client import cached_company_financials, get_company_financials
+
+# One result per input VAT: data is the get_company_financials dict, error the exception (or None)
+EnrichmentResult = namedtuple('EnrichmentResult', ['vat', 'data', 'error'])
+
+
+def enrich_vats(vat_numbers, max_workers=None):
+    """Fetch company data for many VAT numbers with a bounded worker pool
+    
+    Returns a list of EnrichmentResult in the same order as vat_numbers.
+    A failing VAT never aborts the others; its exception is put on the result.
+    """
+    app = current_app._get_current_object()
+    if max_workers is None:
+        max_workers = app.config.get('BIZZY_MAX_WORKERS', 8)
+    
+    def enrich(vat):
+        # Each worker thread gets its own app context and thus its own DB session
+        with app.app_context():
+            try:
+                data = cached_company_financials(vat)
+                if data is None:
+                    db.session.commit()  # No transaction open while waiting on bizzy.ai
+                    data = get_company_financials(vat, use_cache=False)
+                result = EnrichmentResult(vat, data, None)
+            except Exception as e:
+                result = EnrichmentResult(vat, None, e)
+            
+            # Keep cache and negative cache entries written during the fetch, even for failed rows
+            try:
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+            return result
+    
+    if not vat_numbers:
+        return []
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(vat_numbers)))) as executor:
+        return list(executor.map(enrich, vat_numbers))
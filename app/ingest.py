@@ -0,0 +1,186 @@
+import codecs
+import csv
+import itertools
+import re
+import zipfile
+from .vat import looks_like_vat, validate_vats
+
+# Bytes read from the upload at a time; memory use stays around this size, whatever the file size
+CHUNK_SIZE = 64 * 1024
+
+# Text used by csv.Sniffer to detect the delimiter
+SNIFF_SIZE = 64 * 1024
+
+# Delimiters seen in client exports (Excel uses ';' with a Belgian locale)
+DELIMITERS = ",;\t|"
+
+# Header names of a VAT column, lowercase substrings
+VAT_HEADERS = ('btw', 'vat', 'tva', 'ondernemingsnummer', 'enterprise', 'kbo')
+
+_LINE = re.compile(r"[^\r\n]*(?:\r\n|\r|\n)")
+
+
+class UnreadableUpload(ValueError):
+    """Raised for an upload that is not a readable XLSX file (corrupt, or another format renamed)"""
+
+
+# =====================================================
+# CSV / TXT
+# =====================================================
+
+def decode_chunks(stream, chunk_size=CHUNK_SIZE):
+    """Text chunks of a byte stream: UTF-8 (BOM allowed); a chunk that is not valid UTF-8 is read as latin-1"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    while True:
+        chunk = stream.read(chunk_size)
+        pending = decoder.getstate()[0]  # Start of a character split over two chunks
+        try:
+            text = decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError:
+            text = (pending + chunk).decode("latin-1")
+            decoder.reset()
+        if text:
+            yield text
+        if not chunk:
+            return
+
+
+def split_lines(chunks):
+    """Lines (with their line ending) from text chunks; lines may span chunks"""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        end = 0
+        for match in _LINE.finditer(buffer):
+            if match.end() == len(buffer) and buffer.endswith("\r"):
+                break  # Maybe the first half of a \r\n split over two chunks
+            yield match.group()
+            end = match.end()
+        buffer = buffer[end:]
+    if buffer:
+        yield buffer
+
+
+def iter_csv_rows(stream):
+    """(line_no, cells) per row of a CSV/TXT upload, the dialect sniffed from the start of the file"""
+    chunks = decode_chunks(stream)
+    sample = ""
+    for chunk in chunks:
+        sample += chunk
+        if len(sample) >= SNIFF_SIZE:
+            break
+    
+    try:
+        # Only whole lines, a cut-off last line confuses the sniffer
+        dialect = csv.Sniffer().sniff(sample[:sample.rfind("\n") + 1] or sample, delimiters=DELIMITERS)
+    except csv.Error:
+        dialect = csv.excel  # No delimiter: one value per line
+    
+    reader = csv.reader(split_lines(itertools.chain([sample], chunks)), dialect)
+    for cells in reader:
+        yield reader.line_num, cells
+
+
+# =====================================================
+# XLSX
+# =====================================================
+
+def cell_text(value):
+    """Spreadsheet cell as text; VAT numbers typed as numbers lose their '.0'"""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def iter_xlsx_rows(stream):
+    """(line_no, cells) per row of the first sheet of an XLSX upload, read row by row"""
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+    
+    # The sheet is parsed lazily, so a corrupt file can also fail halfway through the rows
+    unreadable = (InvalidFileException, zipfile.BadZipFile, KeyError, SyntaxError, OSError)
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except unreadable as e:
+        raise UnreadableUpload(str(e)) from e
+    try:
+        for line_no, row in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+            yield line_no, [cell_text(value) for value in row]
+    except unreadable as e:
+        raise UnreadableUpload(str(e)) from e
+    finally:
+        workbook.close()
+
+
+# =====================================================
+# VAT NUMBERS FROM AN UPLOAD
+# =====================================================
+
+def clean_cell(cell):
+    """Cell without surrounding whitespace and quotes (Excel CSV quotes values)"""
+    return cell.strip().strip('"').strip("'").strip()
+
+
+def vat_column(cells):
+    """Index of the VAT column when cells is a header row, otherwise None
+    
+    A row holding a VAT number is data, even when another cell mentions a
+    header word (a company called "Enterprise Solutions BV").
+    """
+    if any(looks_like_vat(cell) for cell in cells):
+        return None
+    for i, cell in enumerate(cells):
+        if any(name in cell.lower() for name in VAT_HEADERS):
+            return i
+    return None
+
+
+def iter_vat_values(rows):
+    """(line_no, value) for the VAT cells of (line_no, cells) rows
+    
+    A header row naming a VAT column (BTW, VAT, ondernemingsnummer, ...) selects
+    that column. Without one every non-empty cell is a candidate, so a
+    comma-separated list of VAT numbers on one line keeps working.
+    """
+    column = None
+    first_row = True
+    for line_no, cells in rows:
+        if column is not None:
+            value = clean_cell(cells[column]) if column < len(cells) else ""
+            if value:
+                yield line_no, value
+            continue
+        
+        cells = [clean_cell(cell) for cell in cells]
+        if not any(cells):
+            continue
+        
+        if first_row:
+            first_row = False
+            column = vat_column(cells)
+            if column is not None:
+                continue
+        
+        for cell in cells:
+            if cell and not cell.lower().startswith('vat'):  # Skip header if present
+                yield line_no, cell
+
+
+def iter_upload_vats(file):
+    """(line_no, value) for the VAT numbers in an uploaded CSV/TXT or XLSX file, as a generator"""
+    if file.filename.lower().endswith(".xlsx"):
+        return iter_vat_values(iter_xlsx_rows(file.stream))
+    return iter_vat_values(iter_csv_rows(file.stream))
+
+
+def collect_vats(values, max_examples=5):
+    """Normalize and deduplicate (line_no, value) pairs (input order kept)
+    
+    Returns (vat_numbers, invalid_count, examples) where examples are the
+    first max_examples invalid values as "regel N: value".
+    """
+    vat_numbers, invalid = validate_vats(values)
+    examples = [f"regel {line_no}: {value}" for line_no, value, _ in invalid[:max_examples]]
+    return vat_numbers, len(invalid), examples
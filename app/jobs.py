@@ -0,0 +1,288 @@
+import hashlib
+import threading
+import time
+import uuid
+import click
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from .models import db, Case, Company, DebtorBatch, ImportJob
+from .companies import bulk_upsert_companies, dialect_insert
+from .pdf_cache import mark_stale
+from .enrichment import enrich_vats
+
+
+# =====================================================
+# CSV IMPORT JOBS
+# =====================================================
+
+# Prefix of the error run_import_job adds when a job stops (not an error of one VAT)
+STOPPED_PREFIX = "Import gestopt"
+
+
+def vat_list_hash(vat_numbers):
+    """Fingerprint of an upload's VAT list, to recognize the same upload again"""
+    return hashlib.sha1("\n".join(vat_numbers).encode()).hexdigest()
+
+
+def enqueue_import(batch, user_id, vat_numbers):
+    """Queue a CSV import for the worker (committed by the caller)"""
+    job = ImportJob(
+        batch_id=batch.batch_id,
+        user_id=user_id,
+        vat_numbers=vat_numbers,
+        vat_hash=vat_list_hash(vat_numbers),
+        total=len(vat_numbers),
+        errors=[]
+    )
+    db.session.add(job)
+    return job
+
+
+def stale_before():
+    """Running jobs without a heartbeat since this moment belong to a worker that stopped"""
+    return datetime.utcnow() - timedelta(seconds=current_app.config.get('IMPORT_STALE_AFTER', 600))
+
+
+def touch_heartbeat(job_id):
+    """Set heartbeat_at of a running job to now, in its own transaction"""
+    db.session.execute(
+        db.update(ImportJob).where(
+            ImportJob.job_id == job_id, ImportJob.status == 'running'
+        ).values(heartbeat_at=datetime.utcnow()).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+@contextmanager
+def heartbeat(job_id):
+    """Keep touching heartbeat_at on a background thread while the block runs
+    
+    A chunk can take minutes when bizzy.ai is slow (timeouts, retries); without
+    this, claim_next_job would hand the job to a second worker halfway through.
+    """
+    app = current_app._get_current_object()
+    interval = max(1.0, app.config.get('IMPORT_STALE_AFTER', 600) / 4)
+    stop = threading.Event()
+    
+    def beat():
+        while not stop.wait(interval):
+            # Own app context, so its own DB session next to the worker's
+            with app.app_context():
+                try:
+                    touch_heartbeat(job_id)
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning(f"Heartbeat of import job {job_id} failed: {e}")
+    
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def claim_next_job():
+    """Claim the oldest queued job, or a running job whose worker stopped; SKIP LOCKED lets several workers poll safely"""
+    job = ImportJob.query.filter(
+        (ImportJob.status == 'queued') |
+        ((ImportJob.status == 'running') & (ImportJob.heartbeat_at < stale_before()))
+    ).order_by(
+        ImportJob.created_at, ImportJob.job_id
+    ).with_for_update(skip_locked=True).first()
+    
+    if job is None:
+        db.session.rollback()
+        return None
+    
+    job.status = 'running'
+    job.started_at = job.started_at or datetime.utcnow()
+    job.heartbeat_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+
+# =====================================================
+# RESUMING
+# =====================================================
+
+def is_resumable(job):
+    """True for a job that stopped before the end (failed, or running without heartbeat) of a batch that is still there"""
+    if job is None or job.batch_id is None or job.processed >= job.total:
+        return False
+    stopped = job.status == 'failed' or (
+        job.status == 'running' and job.heartbeat_at is not None and job.heartbeat_at < stale_before()
+    )
+    return stopped and batch_exists(job.batch_id)
+
+
+def resume_import(job):
+    """Queue a stopped job again; the worker continues after the last committed chunk (committed by the caller)"""
+    job.status = 'queued'
+    job.finished_at = None
+    job.errors = [error for error in job.errors or [] if not error.startswith(STOPPED_PREFIX)]
+    return job
+
+
+def find_resumable_import(user_id, vat_numbers):
+    """The user's stopped import of this exact VAT list (a re-submitted upload), or None"""
+    # The join leaves out jobs of deleted batches
+    jobs = ImportJob.query.join(ImportJob.batch).filter(
+        ImportJob.user_id == user_id,
+        ImportJob.vat_hash == vat_list_hash(vat_numbers),
+        ImportJob.status.in_(['failed', 'running'])
+    ).order_by(ImportJob.job_id.desc())
+    return next((job for job in jobs if is_resumable(job)), None)
+
+
+def batch_exists(batch_id):
+    """True while the batch is there and not deleted"""
+    return batch_id is not None and db.session.query(DebtorBatch.batch_id).filter_by(batch_id=batch_id).first() is not None
+
+
+def vats_in_batch(batch_id, vat_numbers):
+    """The VAT numbers among vat_numbers whose company is already in the batch"""
+    return {vat for (vat,) in db.session.query(Company.vat_number).join(Case.company).filter(
+        Case.batch_id == batch_id,
+        Company.vat_number.in_(vat_numbers)
+    )}
+
+
+# =====================================================
+# PROCESSING
+# =====================================================
+
+
+def insert_batch_cases(batch_id, user_id, company_ids):
+    """Add companies to a batch with multi-row INSERTs, returns the number of cases added
+    
+    Companies already in the batch are skipped by the unique (batch_id, company_id)
+    index on live cases instead of a lookup per company.
+    """
+    if not company_ids:
+        return 0
+    
+    rows = [
+        {
+            'case_id': uuid.uuid4(),
+            'company_id': company_id,
+            'user_id': user_id,
+            'batch_id': batch_id,
+            'amount': 0,
+            'status': 'pending',
+            'is_debtor': False,  # Part of batch, not standalone
+            'created_at': datetime.utcnow()
+        }
+        for company_id in sorted(company_ids)
+    ]
+    statement = dialect_insert(Case.__table__).on_conflict_do_nothing(
+        index_elements=[Case.batch_id, Case.company_id],
+        index_where=Case.deleted_at.is_(None)  # Partial index: the WHERE picks it as conflict target
+    ).returning(Case.case_id)
+    
+    # Sent as multi-row VALUES batches; skipped rows return nothing
+    return len(db.session.execute(statement, rows).all())
+
+
+def store_companies_in_batch(batch_id, user_id, companies_data):
+    """Bulk upsert companies (vat_number -> API data) and add them to the batch, returns the number added"""
+    company_ids, changed_ids = bulk_upsert_companies(companies_data)
+    added = insert_batch_cases(batch_id, user_id, set(company_ids.values()))
+    
+    # Bulk statements bypass the flush events that keep the PDF cache in sync
+    mark_stale(db.session, [batch_id], changed_ids)
+    return added
+
+
+def add_companies_to_batch(batch_id, user_id, vat_numbers, results):
+    """Upsert enriched companies and create their batch cases, returns (added, errors)"""
+    errors = [f"{vat}: {str(result.error)}" for vat, result in zip(vat_numbers, results) if result.error]
+    companies_data = {result.vat: result.data for result in results if not result.error}
+    
+    try:
+        with db.session.begin_nested():
+            return store_companies_in_batch(batch_id, user_id, companies_data), errors
+    except SQLAlchemyError:
+        pass
+    
+    # One bad row fails the whole statement: retry row by row so only that VAT is reported
+    added = 0
+    for vat in sorted(companies_data):
+        try:
+            with db.session.begin_nested():
+                added += store_companies_in_batch(batch_id, user_id, {vat: companies_data[vat]})
+        except SQLAlchemyError as e:
+            errors.append(f"{vat}: {str(e)}")
+    
+    return added, errors
+
+
+def run_import_job(job):
+    """Process a claimed job chunk by chunk, committing progress after each chunk"""
+    chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', 25)
+    
+    try:
+        while job.processed < job.total:
+            if not batch_exists(job.batch_id):
+                raise RuntimeError("Batch werd verwijderd tijdens het importeren")
+            
+            # VAT numbers were normalized and validated by upload_csv. A resumed job starts
+            # after the last committed chunk; companies already in the batch need no bizzy.ai call.
+            chunk = job.vat_numbers[job.processed:job.processed + chunk_size]
+            in_batch = vats_in_batch(job.batch_id, chunk)
+            todo = [vat for vat in chunk if vat not in in_batch]
+            
+            # End the read transaction: no connection sits idle in it while bizzy.ai is called.
+            # The ids are read first, touching an expired attribute would start a new one.
+            job_id, batch_id, user_id = job.job_id, job.batch_id, job.user_id
+            db.session.commit()
+            with heartbeat(job_id):
+                results = enrich_vats(todo)
+            added, errors = add_companies_to_batch(batch_id, user_id, todo, results)
+            
+            # Checkpoint: this chunk is committed together with the cases it added
+            job.processed += len(chunk)
+            job.succeeded += added
+            job.failed += len(errors)
+            job.errors = (job.errors or []) + errors  # Reassign so the JSON change is tracked
+            job.heartbeat_at = datetime.utcnow()
+            db.session.commit()
+        
+        job.status = 'done'
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.errors = (job.errors or []) + [f"{STOPPED_PREFIX}: {str(e)}"]
+    
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    return job
+
+
+def run_worker(once=False):
+    """Poll the import_jobs table and process jobs until interrupted"""
+    poll_interval = current_app.config.get('IMPORT_POLL_INTERVAL', 2)
+    
+    while True:
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        
+        current_app.logger.info(f"Processing import job {job.job_id} ({job.total} VATs)")
+        run_import_job(job)
+
+
+def register_commands(app):
+    """Register the worker CLI commands on the app"""
+    
+    @app.cli.command("import-worker")
+    @click.option("--once", is_flag=True, help="Exit when the queue is empty")
+    def import_worker(once):
+        """Run the CSV import worker"""
+        run_worker(once=once)
@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import with_loader_criteria
 from datetime import datetime
 import uuid
 
@@ -32,6 +34,19 @@ class User(db.Model):
 # COMPANY & FINANCIAL DATA
 # =====================================================
 
+def solvency_score(solvency_ratio, debt_ratio, credit_score):
+    """Solvency score from the financial metrics (None when one is missing or 0)"""
+    if not all([solvency_ratio, debt_ratio, credit_score]):
+        return None
+    
+    score = (
+        float(solvency_ratio) * 0.5 +
+        (100 - float(debt_ratio)) * 0.3 +
+        (float(credit_score) / 10) * 0.2
+    )
+    return round(score, 2)
+
+
 class Company(db.Model):
     """Company information with financial health metrics"""
     __tablename__ = 'companies'
@@ -64,6 +79,9 @@ class Company(db.Model):
     equity = db.Column(db.Numeric(15, 2))
     total_debt = db.Column(db.Numeric(15, 2))
     
+    # Stored copy of computed_solvency_score, kept in sync on insert/update (see below)
+    solvency_score = db.Column(db.Numeric(10, 2))
+    
     # Soft delete
     deleted_at = db.Column(db.DateTime, nullable=True)
     
@@ -73,17 +91,49 @@ class Company(db.Model):
     def __repr__(self):
         return f"<Company {self.company_name}>"
     
+    @hybrid_property
+    def computed_solvency_score(self):
+        """Solvency score from the financial metrics (None when one is missing or 0)"""
+        return solvency_score(self.solvency_ratio, self.debt_ratio, self.credit_score)
+    
+    @computed_solvency_score.expression
+    def computed_solvency_score(cls):
+        """Same formula in SQL, for filtering and backfills"""
+        missing = db.or_(*[
+            db.func.coalesce(column, 0) == 0
+            for column in (cls.solvency_ratio, cls.debt_ratio, cls.credit_score)
+        ])
+        score = cls.solvency_ratio * 0.5 + (100 - cls.debt_ratio) * 0.3 + (cls.credit_score / 10) * 0.2
+        return db.case((missing, None), else_=db.func.round(score, 2))
+    
     def calculate_solvency_score(self):
         """Calculate solvency score based on financial metrics"""
-        if not all([self.solvency_ratio, self.debt_ratio, self.credit_score]):
-            return None
-        
-        score = (
-            float(self.solvency_ratio) * 0.5 +
-            (100 - float(self.debt_ratio)) * 0.3 +
-            (float(self.credit_score) / 10) * 0.2
-        )
-        return round(score, 2)
+        return self.computed_solvency_score
+
+
+@db.event.listens_for(Company, 'before_insert')
+@db.event.listens_for(Company, 'before_update')
+def sync_solvency_score(mapper, connection, company):
+    """Store the solvency score whenever bizzy.ai data is written"""
+    company.solvency_score = company.computed_solvency_score
+
+
+# Batch visit order (see batches.py): highest quick ratio first, then most cash.
+# Missing values get a sentinel below any storable value, i.e. DESC NULLS LAST.
+QUICK_RATIO_SORT_KEY = db.func.coalesce(Company.quick_ratio, -1000000)
+CASH_SORT_KEY = db.func.coalesce(Company.cash, -10000000000000)
+
+db.Index('ix_companies_visit_order', QUICK_RATIO_SORT_KEY.desc(), CASH_SORT_KEY.desc())
+
+# Best solvency score first, companies without a score last
+SOLVENCY_SORT_KEY = db.func.coalesce(Company.solvency_score, -1000000)
+
+db.Index('ix_companies_solvency_score', SOLVENCY_SORT_KEY.desc())
+
+# Expired rows for the purge job (purge.py)
+db.Index('ix_companies_deleted_at', Company.deleted_at,
+         postgresql_where=db.text('deleted_at IS NOT NULL'),
+         sqlite_where=db.text('deleted_at IS NOT NULL'))
 
 
 # =====================================================
@@ -101,6 +151,17 @@ class DebtorBatch(db.Model):
     description = db.Column(db.Text)
     deleted_at = db.Column(db.DateTime, nullable=True)
     
+    __table_args__ = (
+        # Batches of a user, newest first (debtors page, add_debtor); deleted batches left out
+        db.Index('ix_debtor_batches_user_created', user_id, created_at.desc(),
+                 postgresql_where=db.text('deleted_at IS NULL'),
+                 sqlite_where=db.text('deleted_at IS NULL')),
+        # Expired rows for the purge job (purge.py)
+        db.Index('ix_debtor_batches_deleted_at', deleted_at,
+                 postgresql_where=db.text('deleted_at IS NOT NULL'),
+                 sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
+    
     # Relationships
     cases = db.relationship('Case', backref='batch', lazy=True, foreign_keys='Case.batch_id')
     user = db.relationship('User', backref='debtor_batches', lazy=True)
@@ -123,5 +184,135 @@ class Case(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     deleted_at = db.Column(db.DateTime, nullable=True)
     
+    __table_args__ = (
+        # A live case per company and batch; bulk imports rely on it (ON CONFLICT DO NOTHING),
+        # a deleted debtor can be added again. Also serves the cases of one batch (batch_detail,
+        # export, keyset feed).
+        db.Index('uq_cases_batch_company', 'batch_id', 'company_id', unique=True,
+                 postgresql_where=db.text('deleted_at IS NULL'),
+                 sqlite_where=db.text('deleted_at IS NULL')),
+        # Debtors page and search: all cases of a user
+        db.Index('ix_cases_user_debtor_batch', 'user_id', 'is_debtor', 'batch_id',
+                 postgresql_where=db.text('deleted_at IS NULL'),
+                 sqlite_where=db.text('deleted_at IS NULL')),
+        # Debtors page: standalone debtors of a user
+        db.Index('ix_cases_standalone_debtors', 'user_id',
+                 postgresql_where=db.text('batch_id IS NULL AND is_debtor AND deleted_at IS NULL'),
+                 sqlite_where=db.text('batch_id IS NULL AND is_debtor AND deleted_at IS NULL')),
+        # Batches holding a company (PDF cache invalidation, company deletes via the FK)
+        db.Index('ix_cases_company_batch', 'company_id', 'batch_id'),
+        # Every case of a batch, deleted or not (batch deletes via the FK)
+        db.Index('ix_cases_batch_id', 'batch_id'),
+        # Expired rows for the purge job (purge.py)
+        db.Index('ix_cases_deleted_at', 'deleted_at',
+                 postgresql_where=db.text('deleted_at IS NOT NULL'),
+                 sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
+    
     def __repr__(self):
         return f"<Case {self.case_id} - {self.status}>"
+
+
+# =====================================================
+# SOFT DELETE
+# =====================================================
+# Deleting a company, batch or case sets deleted_at; `flask purge-deleted`
+# (purge.py) removes the rows after SOFT_DELETE_RETENTION_DAYS.
+
+SOFT_DELETE_MODELS = (Company, DebtorBatch, Case)
+
+
+@db.event.listens_for(db.session, 'do_orm_execute')
+def hide_deleted_rows(execute_state):
+    """Add deleted_at IS NULL for the soft-delete models to every ORM SELECT
+    
+    The criteria also apply to joins and to relationship loads of the objects
+    loaded. Queries that need deleted rows use .execution_options(include_deleted=True).
+    """
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get('include_deleted', False)
+    ):
+        execute_state.statement = execute_state.statement.options(*[
+            with_loader_criteria(model, model.deleted_at.is_(None), include_aliases=True)
+            for model in SOFT_DELETE_MODELS
+        ])
+
+
+# =====================================================
+# BACKGROUND JOBS
+# =====================================================
+
+class ImportJob(db.Model):
+    """CSV batch import processed by the import worker (flask import-worker)"""
+    __tablename__ = 'import_jobs'
+    
+    job_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    batch_id = db.Column(db.Integer, db.ForeignKey('debtor_batches.batch_id', ondelete='SET NULL'), nullable=True)
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.user_id', ondelete='SET NULL'), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    vat_numbers = db.Column(db.JSON, nullable=False)  # VAT numbers as parsed from the upload
+    total = db.Column(db.Integer, nullable=False, default=0)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    succeeded = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=False, default=list)  # "VAT: message" strings
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    # Resuming: processed is the checkpoint (vat_numbers before it are committed), the worker
+    # touches heartbeat_at after every chunk, vat_hash recognizes a re-submitted upload
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    vat_hash = db.Column(db.String(40), nullable=True)
+    
+    # Relationships
+    batch = db.relationship('DebtorBatch', backref='import_jobs', lazy=True)
+    
+    def __repr__(self):
+        return f"<ImportJob {self.job_id} - {self.status}>"
+    
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "errors": (self.errors or [])[:5]
+        }
+
+
+# =====================================================
+# BIZZY.AI RESPONSE CACHE
+# =====================================================
+
+class BizzyCache(db.Model):
+    """Raw bizzy.ai Details + Financials responses per cleaned VAT number"""
+    __tablename__ = 'bizzy_cache'
+    
+    vat = db.Column(db.String(10), primary_key=True)  # Output of clean_vat_number (9 or 10 digits)
+    details = db.Column(db.JSON, nullable=False)
+    financials = db.Column(db.JSON, nullable=False)
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<BizzyCache {self.vat} @ {self.fetched_at}>"
+
+
+class BizzyNegativeCache(db.Model):
+    """Remembered bizzy.ai failures (unknown VAT, no financials) so we don't pay for them twice"""
+    __tablename__ = 'bizzy_negative_cache'
+    
+    vat = db.Column(db.String(10), primary_key=True)  # Output of clean_vat_number
+    reason = db.Column(db.String(30), primary_key=True)  # not_found, no_financials
+    message = db.Column(db.Text, nullable=False)  # Error shown to the user on a cache hit
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<BizzyNegativeCache {self.vat} {self.reason} ({self.hits} hits)>"
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import date
+from flask import current_app
+from .models import db, Case, Company, DebtorBatch
+from .companies import COMPANY_FIELDS
+
+# Bump to drop every cached PDF after a change in how PDFs are rendered
+PDF_CACHE_VERSION = 1
+
+# Company columns that change what (or in which order) a batch PDF shows
+PDF_COMPANY_FIELDS = COMPANY_FIELDS + ['vat_number', 'solvency_score']
+
+# Config keys that influence the order of a PDF (route planner)
+PDF_CONFIG_KEYS = ['ROUTE_PRIORITY_WEIGHT', 'ROUTE_START_POSTAL_CODE']
+
+
+def pdf_cache_dir():
+    """Cache directory from PDF_CACHE_DIR, or None when caching is disabled"""
+    return current_app.config.get('PDF_CACHE_DIR') or None
+
+
+def batch_cache_dir(cache_dir, batch_id):
+    return os.path.join(cache_dir, f"batch_{batch_id}")
+
+
+def pdf_export_date():
+    """Export date printed on a PDF; part of the cache key, so a cached PDF never shows an old date"""
+    return date.today()
+
+
+def pdf_cache_key(batch, sort):
+    """Hash of everything the PDF of a batch depends on (also used as ETag)
+    
+    Batch fields, the case set with the company data of every case, the sort,
+    the export date, the relevant config and the template source.
+    """
+    digest = hashlib.sha256()
+    digest.update(repr((PDF_CACHE_VERSION, sort, batch.batch_id, batch.batch_name,
+                        batch.description, batch.created_at, pdf_export_date())).encode())
+    digest.update(repr([current_app.config.get(key) for key in PDF_CONFIG_KEYS]).encode())
+    
+    template_source, _, _ = current_app.jinja_env.loader.get_source(current_app.jinja_env, "batch_pdf.html")
+    digest.update(template_source.encode())
+    
+    rows = db.session.query(
+        Case.case_id, *[getattr(Company, field) for field in PDF_COMPANY_FIELDS]
+    ).join(Case.company).filter(
+        Case.batch_id == batch.batch_id
+    ).order_by(Case.case_id)
+    for row in rows:
+        digest.update(repr(tuple(row)).encode())
+    
+    return digest.hexdigest()
+
+
+def pdf_file_path(cache_dir, batch_id, key):
+    return os.path.join(batch_cache_dir(cache_dir, batch_id), f"{key}.pdf")
+
+
+def cached_pdf_path(batch_id, key):
+    """Path of the cached PDF for a cache key, or None when it is not cached (or caching is off)"""
+    cache_dir = pdf_cache_dir()
+    if not cache_dir:
+        return None
+    path = pdf_file_path(cache_dir, batch_id, key)
+    return path if os.path.exists(path) else None
+
+
+def write_file_atomic(path, data):
+    """Write data to path via a temp file + rename, so readers never see a partial PDF"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def prune_old_pdfs(path):
+    """Remove the PDFs next to path that were written before today
+    
+    Their keys hold an older export date, so they can never be served again.
+    Called after a successful write; other sorts of the same day are kept.
+    """
+    directory = os.path.dirname(path)
+    today = pdf_export_date()
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".pdf") and entry.path != path:
+            try:
+                if date.fromtimestamp(entry.stat().st_mtime) < today:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # Removed by another render or an invalidation
+
+
+def invalidate_batches(batch_ids):
+    """Remove the cached PDFs of these batches"""
+    cache_dir = pdf_cache_dir()
+    if not cache_dir:
+        return
+    for batch_id in batch_ids:
+        shutil.rmtree(batch_cache_dir(cache_dir, batch_id), ignore_errors=True)
+
+
+# =====================================================
+# INVALIDATION (SQLAlchemy session events)
+# =====================================================
+# The cache key already changes with the data; these events remove stale files
+# right away instead of leaving them on disk.
+
+def mark_stale(session, batch_ids=(), company_ids=()):
+    """Remove the PDFs of these batches and of the batches holding these companies after the commit
+    
+    Called by the flush event below, and directly after bulk statements the ORM does not see.
+    """
+    stale = session.info.setdefault('pdf_cache_stale', set())
+    stale.update(batch_ids)
+    if company_ids:
+        stale.update(batch_id for (batch_id,) in session.execute(
+            db.select(Case.batch_id).where(Case.company_id.in_(list(company_ids))).distinct()
+        ))
+    stale.discard(None)
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def collect_stale_batches(session, flush_context):
+    """Remember which batches this flush changed; files are removed after the commit"""
+    batch_ids = set()
+    company_ids = set()
+    
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Case):
+            batch_ids.add(obj.batch_id)
+            # A case moved to another batch also changes its old batch
+            batch_ids.update(db.inspect(obj).attrs.batch_id.history.deleted)
+        elif isinstance(obj, DebtorBatch):
+            batch_ids.add(obj.batch_id)
+        elif isinstance(obj, Company) and obj not in session.new and session.is_modified(obj):
+            company_ids.add(obj.company_id)
+    
+    mark_stale(session, batch_ids, company_ids)
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def remove_stale_pdfs(session):
+    stale = session.info.pop('pdf_cache_stale', None)
+    if stale:
+        try:
+            invalidate_batches(stale)
+        except RuntimeError:
+            pass  # No app context (e.g. a script using the models directly)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def forget_stale_batches(session):
+    session.info.pop('pdf_cache_stale', None)
@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from flask import current_app, render_template
+from .batches import batch_cases, batch_route
+from .pdf_cache import (pdf_cache_dir, pdf_file_path, cached_pdf_path, write_file_atomic, pdf_export_date,
+                        prune_old_pdfs)
+
+# xhtml2pdf is CPU-bound: it runs in worker processes so the web process keeps serving
+# requests. Jobs are keyed by PDF cache key, so two clicks on the same export share one job.
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+_jobs = {}  # PDF cache key -> Future of render_pdf_to_file
+_jobs_lock = threading.Lock()
+
+
+# =====================================================
+# RUNS IN THE POOL PROCESSES
+# =====================================================
+
+def render_pdf(html):
+    """HTML -> PDF bytes"""
+    from xhtml2pdf import pisa
+    
+    pdf_file = BytesIO()
+    pisa.CreatePDF(html, dest=pdf_file)
+    return pdf_file.getvalue()
+
+
+def render_pdf_to_file(html, path):
+    """Render straight into the PDF cache, only the path travels back"""
+    write_file_atomic(path, render_pdf(html))
+    prune_old_pdfs(path)
+    return path
+
+
+# =====================================================
+# RUNS IN THE WEB PROCESS
+# =====================================================
+
+def get_render_pool():
+    """Process pool for PDF rendering, one per (forked) process, rebuilt after a worker crash"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid() or _pool._broken:
+            if _pool is not None and _pool_pid == os.getpid():
+                # A crashed worker breaks the whole pool: every submit would raise
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: the workers must not inherit DB connections or threads from the web process
+            _pool = ProcessPoolExecutor(
+                max_workers=current_app.config.get('PDF_RENDER_WORKERS', 2),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_pid = os.getpid()
+            _jobs.clear()
+        return _pool
+
+
+def submit_render(fn, *args):
+    """Submit to the render pool; a pool that broke since the last job is rebuilt once"""
+    try:
+        return get_render_pool().submit(fn, *args)
+    except BrokenProcessPool:
+        return get_render_pool().submit(fn, *args)
+
+
+def batch_pdf_html(batch, sort):
+    """batch_pdf.html for a batch (the fast part, needs the DB)"""
+    return render_template("batch_pdf.html",
+                           batch=batch,
+                           cases=batch_cases(batch.batch_id, sort),
+                           sort=sort,
+                           route=batch_route(batch.batch_id) if sort == 'route' else None,
+                           export_date=pdf_export_date())
+
+
+def render_batch_pdf_now(batch, sort):
+    """PDF bytes, rendered in the pool while this request waits (used when the PDF cache is off)"""
+    html = batch_pdf_html(batch, sort)
+    return submit_render(render_pdf, html).result()
+
+
+def start_batch_pdf(batch, sort, key):
+    """Start rendering the PDF of a batch into the cache unless it is cached or already running
+    
+    A job that failed is dropped and started again, so the next export retries it.
+    """
+    with _jobs_lock:
+        if key in _jobs and not _failed(_jobs[key]):
+            return _jobs[key]
+    if cached_pdf_path(batch.batch_id, key):
+        return None
+    
+    html = batch_pdf_html(batch, sort)
+    path = pdf_file_path(pdf_cache_dir(), batch.batch_id, key)
+    with _jobs_lock:
+        if key in _jobs and not _failed(_jobs[key]):
+            return _jobs[key]
+        future = submit_render(render_pdf_to_file, html, path)
+        _jobs[key] = future
+    
+    # Outside the lock: runs right away when the job is already done
+    future.add_done_callback(lambda f: _finish(key, f))
+    return future
+
+
+def _failed(future):
+    return future.done() and future.exception() is not None
+
+
+def _finish(key, future):
+    # Done: the file is in the cache now. Failed: keep the job until the next start so the status shows the error.
+    if future.exception() is None:
+        with _jobs_lock:
+            _jobs.pop(key, None)
+
+
+def render_state(batch_id, key):
+    """'ready', 'running', 'failed' or None (not started) for a PDF cache key"""
+    if cached_pdf_path(batch_id, key):
+        return 'ready'
+    with _jobs_lock:
+        future = _jobs.get(key)
+    if future is None:
+        return None
+    if _failed(future):
+        return 'failed'
+    return 'running'
+
+
+def forget_failed_render(key):
+    """Drop a failed job so the next export tries again"""
+    with _jobs_lock:
+        future = _jobs.get(key)
+        if future is not None and _failed(future):
+            del _jobs[key]
+            return future.exception()
+    return None
@@ -0,0 +1,77 @@
+import time
+import click
+from datetime import datetime, timedelta
+from flask import current_app
+from .models import db, Case, Company, DebtorBatch
+
+
+# =====================================================
+# PURGE OF SOFT-DELETED ROWS
+# =====================================================
+# Deletes set deleted_at (see models.hide_deleted_rows); this job removes the
+# rows for good once they are older than SOFT_DELETE_RETENTION_DAYS. Each
+# transaction deletes at most PURGE_BATCH_SIZE rows, so locks on cases stay
+# short and web requests are not blocked behind one large DELETE.
+
+def purge_cutoff(retention_days=None):
+    """Rows deleted before this moment are purged"""
+    if retention_days is None:
+        retention_days = current_app.config.get('SOFT_DELETE_RETENTION_DAYS', 30)
+    return datetime.utcnow() - timedelta(days=retention_days)
+
+
+def delete_in_batches(table, condition, batch_size, pause):
+    """DELETE the rows of table matching condition, batch_size rows per transaction; returns the number deleted"""
+    key = table.primary_key.columns[0]
+    deleted = 0
+    while True:
+        # Core statements: the soft-delete filter of ORM queries does not apply
+        result = db.session.execute(
+            db.delete(table).where(key.in_(db.select(key).where(condition).limit(batch_size)))
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+        time.sleep(pause)  # Let waiting writers through between batches
+
+
+def purge_deleted(retention_days=None, batch_size=None, pause=None):
+    """Remove cases, batches and companies deleted longer than the retention period ago
+    
+    Returns {table name: rows removed}. Cases go first: a batch or company is
+    only removed once no case points to it anymore.
+    """
+    cutoff = purge_cutoff(retention_days)
+    batch_size = batch_size or current_app.config.get('PURGE_BATCH_SIZE', 500)
+    pause = current_app.config.get('PURGE_PAUSE', 0.2) if pause is None else pause
+    
+    cases = Case.__table__
+    batches = DebtorBatch.__table__
+    companies = Company.__table__
+    expired_batches = db.select(batches.c.batch_id).where(batches.c.deleted_at < cutoff)
+    
+    return {
+        # Also cases an import added to a batch after it was deleted
+        'cases': delete_in_batches(cases, db.or_(
+            cases.c.deleted_at < cutoff, cases.c.batch_id.in_(expired_batches)
+        ), batch_size, pause),
+        'debtor_batches': delete_in_batches(batches, batches.c.deleted_at < cutoff, batch_size, pause),
+        'companies': delete_in_batches(companies, db.and_(
+            companies.c.deleted_at < cutoff,
+            ~db.select(cases.c.case_id).where(cases.c.company_id == companies.c.company_id).exists()
+        ), batch_size, pause),
+    }
+
+
+def register_commands(app):
+    """Register the purge CLI command on the app"""
+    
+    @app.cli.command("purge-deleted")
+    @click.option("--days", type=int, default=None,
+                  help="Keep deleted rows this many days (default SOFT_DELETE_RETENTION_DAYS)")
+    @click.option("--batch-size", type=int, default=None, help="Rows per transaction (default PURGE_BATCH_SIZE)")
+    def purge_deleted_command(days, batch_size):
+        """Permanently remove soft-deleted cases, batches and companies past the retention period"""
+        for table, count in purge_deleted(retention_days=days, batch_size=batch_size).items():
+            click.echo(f"{table}: {count} rows purged")
@@ -0,0 +1,190 @@
+import csv
+import os
+import re
+import time
+from bisect import bisect_left
+import numpy as np
+
+# Approximate centroid per Belgian postal code (one row per municipality / district)
+CENTROIDS_FILE = os.path.join(os.path.dirname(__file__), "data", "postal_code_centroids_be.csv")
+
+# Road distance is on average about 1.3x the straight line distance
+DETOUR_FACTOR = 1.3
+
+_centroids = None
+
+
+# =====================================================
+# GEOCODING
+# =====================================================
+
+def load_centroids():
+    """postal code -> (latitude, longitude), read once per process"""
+    global _centroids
+    if _centroids is None:
+        with open(CENTROIDS_FILE, encoding="utf-8") as f:
+            _centroids = {
+                row["postal_code"]: (float(row["latitude"]), float(row["longitude"]))
+                for row in csv.DictReader(f)
+            }
+    return _centroids
+
+
+def extract_postal_code(address):
+    """Postal code from a company_address ('Street 12, 9000, Gent'), or None"""
+    if not address:
+        return None
+    # parse_company_data stores the postal code as its own comma separated part
+    for part in reversed(address.split(",")):
+        if re.fullmatch(r"\s*\d{4}\s*", part):
+            return part.strip()
+    matches = re.findall(r"\b[1-9]\d{3}\b", address)
+    return matches[-1] if matches else None
+
+
+def geocode_postal_code(postal_code):
+    """(latitude, longitude) for a postal code, or None
+    
+    Codes missing from the table use the numerically closest known code with
+    the same first two digits, which in Belgium is nearly always close by.
+    """
+    if not postal_code:
+        return None
+    centroids = load_centroids()
+    if postal_code in centroids:
+        return centroids[postal_code]
+    
+    codes = sorted(centroids)
+    i = bisect_left(codes, postal_code)
+    neighbours = [code for code in codes[max(i - 1, 0):i + 1] if code[:2] == postal_code[:2]]
+    if not neighbours:
+        return None
+    closest = min(neighbours, key=lambda code: abs(int(code) - int(postal_code)))
+    return centroids[closest]
+
+
+def geocode_address(address):
+    """(latitude, longitude) for a company_address, or None when the postal code is unknown"""
+    return geocode_postal_code(extract_postal_code(address))
+
+
+def distance_matrix(coordinates):
+    """Pairwise travel distances in km (haversine x DETOUR_FACTOR) for an (n, 2) array of lat/lon"""
+    lat, lon = np.radians(coordinates[:, 0]), np.radians(coordinates[:, 1])
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlon / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(np.clip(a, 0, 1))) * DETOUR_FACTOR
+
+
+# =====================================================
+# ROUTE SOLVER
+# =====================================================
+
+def nearest_neighbour_route(distances, priorities, priority_weight, start=None):
+    """Greedy order: repeatedly go to the stop with the lowest distance minus priority bonus"""
+    n = len(priorities)
+    visited = np.zeros(n, dtype=bool)
+    
+    # Visiting a stop now instead of after the remaining stops saves about this much
+    def bonus():
+        return priorities * priority_weight * (n - visited.sum())
+    
+    # Without a start location, begin at the stop with the highest priority
+    current = int(np.argmax(priorities)) if start is None else int(np.argmin(start - bonus()))
+    order = [current]
+    visited[current] = True
+    while len(order) < n:
+        cost = np.where(visited, np.inf, distances[current] - bonus())
+        current = int(np.argmin(cost))
+        order.append(current)
+        visited[current] = True
+    return order
+
+
+def route_cost(route, distances, priorities, priority_weight, start=None):
+    """Travel distance plus priority_weight km per position a stop is visited late, per unit of priority"""
+    route = np.asarray(route)
+    travel = distances[route[:-1], route[1:]].sum() + (start[route[0]] if start is not None else 0.0)
+    return travel + priority_weight * float(np.dot(np.arange(len(route)), priorities[route]))
+
+
+def two_opt(route, distances, priorities, priority_weight, start=None, time_limit=0.8):
+    """Improve an open route with 2-opt moves, evaluating all segment ends per start in one NumPy pass
+    
+    Reversing route[i..j] changes two edges and the positions of the stops in
+    between; the position change (the priority term) follows from prefix sums.
+    """
+    route = np.array(route)
+    n = len(route)
+    if n < 3:
+        return route.tolist()
+    
+    deadline = time.monotonic() + time_limit
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for i in range(n - 1):
+            # Edge into the segment: from the previous stop, or from the start location
+            a = route[i - 1] if i > 0 else None
+            b = route[i]
+            js = np.arange(i + 1, n)
+            c = route[js]
+            d = np.append(route[i + 2:], -1)  # -1: the segment ends the route, no outgoing edge
+            
+            if a is not None:
+                before_in, after_in = distances[a, b], distances[a, c]
+            elif start is not None:
+                before_in, after_in = start[b], start[c]
+            else:
+                before_in, after_in = 0.0, np.zeros(len(js))
+            has_next = d >= 0
+            before_out = np.where(has_next, distances[c, np.where(has_next, d, 0)], 0.0)
+            after_out = np.where(has_next, distances[b, np.where(has_next, d, 0)], 0.0)
+            travel_delta = after_in + after_out - before_in - before_out
+            
+            # Stop at position k moves to i + j - k
+            weights = priorities[route]
+            segment_sum = np.cumsum(weights[i:])[1:]
+            segment_moment = np.cumsum(weights[i:] * np.arange(i, n))[1:]
+            priority_delta = priority_weight * ((i + js) * segment_sum - 2 * segment_moment)
+            
+            delta = travel_delta + priority_delta
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                j = int(js[best])
+                route[i:j + 1] = route[i:j + 1][::-1]
+                improved = True
+    
+    return route.tolist()
+
+
+def plan_route(coordinates, priorities, priority_weight=0.5, start=None, time_limit=0.8):
+    """Visit order (indices into coordinates) for one day of visits
+    
+    coordinates is an (n, 2) lat/lon array, priorities are 0..1 (1 = visit
+    first). priority_weight is the detour in km accepted per unit of priority
+    and per position a stop moves forward. start is an optional (lat, lon).
+    """
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    priorities = np.asarray(priorities, dtype=float)
+    if len(coordinates) == 0:
+        return []
+    
+    distances = distance_matrix(coordinates)
+    start_distances = None
+    if start is not None:
+        start_distances = distance_matrix(np.vstack([coordinates, start]))[-1, :-1]
+    
+    route = nearest_neighbour_route(distances, priorities, priority_weight, start_distances)
+    return two_opt(route, distances, priorities, priority_weight, start_distances, time_limit)
+
+
+def route_distance(coordinates, route, start=None):
+    """Total travel distance in km of a planned route"""
+    if not route:
+        return 0.0
+    coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    points = coordinates[route] if start is None else np.vstack([start, coordinates[route]])
+    legs = distance_matrix(points)
+    return float(legs[np.arange(len(points) - 1), np.arange(1, len(points))].sum())
@@ -1,9 +1,18 @@
-from flask import Blueprint, request, redirect, url_for, render_template, session, flash
-from .models import db, User, Company, Case, DebtorBatch
-from .api_client import get_company_financials
-import re
+from flask import Blueprint, request, redirect, url_for, render_template, session, flash, jsonify, current_app
+from .models import db, User, Company, Case, DebtorBatch, ImportJob
+from sqlalchemy.orm import contains_eager, joinedload
+from .vat import normalize_vat, looks_like_vat, clean_vat_number, InvalidVatError
+from .bizzy_cache import get_cache_entry, is_fresh
+from .companies import fetch_company, refresh_company_in_background, search_companies_by_name, name_contains
+from .jobs import enqueue_import, find_resumable_import, resume_import, is_resumable, batch_exists
+from .suggest import suggest_index, sync_suggest_index
+from .batches import batch_cases_page, batch_score_counts, batch_route, batch_sort, route_too_large
+from .pdf_cache import pdf_cache_key, pdf_cache_dir, cached_pdf_path
+from .ingest import iter_upload_vats, collect_vats, UnreadableUpload
+from .pdf_render import start_batch_pdf, render_state, forget_failed_render, render_batch_pdf_now
 import csv
 import io
+import zipfile
 from datetime import datetime
 
 main = Blueprint("main", __name__)
@@ -112,79 +121,78 @@ def dashboard():
         return render_template("dashboard.html", user=user, companies=companies)
     
     # Check if query could be a VAT number (BTW-nummer)
-    import re
-    # Normalize the query: uppercase, remove spaces, dots, and hyphens
-    normalized_query = query.upper().replace(' ', '').replace('.', '').replace('-', '')
-
-    # Check if it looks like a Belgian VAT number with BE prefix
-    if normalized_query.startswith('BE') and normalized_query[2:].isdigit() and len(normalized_query) in [11, 12]:
-        # The VAT number is already clean and normalized
-        return redirect(url_for('main.search_vat', vat_number=normalized_query))
-    
-    # Check if it's a 9 or 10 digit number (Belgian VAT without BE prefix)
-    if normalized_query.isdigit() and len(normalized_query) in [9, 10]:
-        # Prepend BE to make it a full Belgian VAT number
-        return redirect(url_for('main.search_vat', vat_number=f'BE{normalized_query}'))
-    
-    # Search companies by name
-    companies = Company.query.filter(
-        Company.company_name.ilike(f"%{query}%")
-    ).all()
+    if looks_like_vat(query):
+        # Reject mistyped numbers locally instead of after two bizzy.ai calls
+        try:
+            return redirect(url_for('main.search_vat', vat_number=normalize_vat(query)))
+        except InvalidVatError as e:
+            return render_template("dashboard.html", user=user, error=str(e))
+    
+    # Search companies by name (ranked, one page at a time, hard page limit)
+    max_pages = current_app.config.get('SEARCH_MAX_PAGES', 20)
+    page = min(max(request.args.get("page", 1, type=int), 1), max_pages)
+    sort = request.args.get("sort", "relevance")
+    companies, has_next = search_companies_by_name(
+        query,
+        page=page,
+        per_page=current_app.config.get('SEARCH_PAGE_SIZE', 25),
+        sort=sort
+    )
     
     # No results found
     if not companies:
         error = "Geen bedrijf gevonden"
         return render_template("dashboard.html", user=user, error=error)
     
-    return render_template("dashboard.html", user=user, companies=companies)
+    return render_template("dashboard.html", user=user, companies=companies, sort=sort,
+                           page=page, has_next=has_next and page < max_pages)
+
+
+@main.route("/api/companies/suggest")
+def suggest_companies():
+    """Type-ahead suggestions (name or VAT prefix) from the in-memory index"""
+    query = request.args.get("q", "").strip()
+    limit = min(request.args.get("limit", 8, type=int), 20)
+    if len(query) < 2:
+        return jsonify([])
+    
+    sync_suggest_index(current_app.config.get('SUGGEST_INDEX_MAX_AGE', 300),
+                       current_app.config.get('SUGGEST_INDEX_REBUILD_AGE', 3600))
+    return jsonify([
+        dict(match, url=url_for("main.company", company_id=match["company_id"]))
+        for match in suggest_index.search(query, limit=limit)
+    ])
 
 
 @main.route("/search_vat/<vat_number>")
 def search_vat(vat_number):
     """Search company by VAT number and fetch data from bizzy.ai API"""
     try:
-        # Clean VAT number for storage consistency
-        clean_vat = f"BE{vat_number.replace('BE', '').replace(' ', '').replace('.', '').replace('-', '')}"
+        # Normalize and validate VAT number (checksum) before any API call
+        clean_vat = normalize_vat(vat_number)
         
-        # Fetch comprehensive data from API (Details + Financials)
-        api_data = get_company_financials(clean_vat)
-        
-        # Find or create company record using clean VAT number
+        # Known company: render it right away, refresh stale data in the background
         company = Company.query.filter_by(vat_number=clean_vat).first()
-        if not company:
-            company = Company(vat_number=clean_vat)
-        
-        # Update with all API data
-        company.company_name = api_data.get('company_name')
-        company.company_address = api_data.get('company_address')
-        company.established_since = api_data.get('established_since')
-        company.revenue_estimation = api_data.get('revenue_estimation')
-        company.employee_estimation = api_data.get('employee_estimation')
-        company.common_score = api_data.get('common_score')
-        company.credit_limit = api_data.get('credit_limit')
-        company.credit_score = api_data.get('credit_score')
-        company.solvency_ratio = api_data.get('solvency_ratio')
-        company.debt_ratio = api_data.get('debt_ratio')
-        company.current_ratio = api_data.get('current_ratio')
-        company.quick_ratio = api_data.get('quick_ratio')
-        company.ebitda = api_data.get('ebitda')
-        company.net_profit = api_data.get('net_profit')
-        company.total_assets = api_data.get('total_assets')
-        company.equity = api_data.get('equity')
-        company.total_debt = api_data.get('total_debt')
-        company.sector = api_data.get('sector')
+        if company:
+            entry = get_cache_entry(clean_vat_number(clean_vat))
+            if entry is None or not is_fresh(entry):
+                refresh_company_in_background(clean_vat)
+            return redirect(url_for("main.company", company_id=company.company_id))
         
-        db.session.add(company)
-        db.session.commit()
+        # Fetch comprehensive data from API (Details + Financials) and store it;
+        # simultaneous lookups of this VAT share one fetch
+        company_id = fetch_company(clean_vat)
         
         # Redirect to company detail page
-        return redirect(url_for("main.company", company_id=company.company_id))
-        
+        return redirect(url_for("main.company", company_id=company_id))
+    
+    except InvalidVatError as e:
+        current_app.logger.info(f"search_vat: invalid VAT {vat_number}: {e}")
+        flash(f"Fout bij opzoeken bedrijf: {str(e)}", "danger")
+        return redirect(url_for("main.dashboard"))
     except Exception as e:
         # On error, redirect back to dashboard with error
-        import traceback
-        print(f"Error in search_vat: {str(e)}")
-        print(traceback.format_exc())
+        current_app.logger.exception(f"Error in search_vat for {vat_number}")
         flash(f"Fout bij opzoeken bedrijf: {str(e)}", "danger")
         return redirect(url_for("main.dashboard"))
 
@@ -216,31 +224,44 @@ def debtors():
     # Get all batches for this user
     batches = DebtorBatch.query.filter_by(user_id=session['user_id']).order_by(DebtorBatch.created_at.desc()).all()
     
-    # Get standalone debtors (not in any batch)
-    standalone_debtors = Case.query.filter_by(
+    # Number of cases per batch in one aggregate query (instead of loading batch.cases per card)
+    batch_case_counts = dict(
+        db.session.query(Case.batch_id, db.func.count(Case.case_id)).filter(
+            Case.batch_id.in_([batch.batch_id for batch in batches])
+        ).group_by(Case.batch_id).all()
+    ) if batches else {}
+    
+    # Get standalone debtors (not in any batch), with their company in the same query
+    standalone_debtors = Case.query.options(joinedload(Case.company)).filter_by(
         user_id=session['user_id'], 
         is_debtor=True,
         batch_id=None
     ).all()
     
-    # Search functionality
+    # Search functionality: one query, matching and limiting done in SQL
     search_results = []
     if search_query:
-        # Search in all batches for companies matching the query
-        all_cases = Case.query.filter_by(user_id=session['user_id']).join(Company).filter(
-            (Case.batch_id.isnot(None)) | (Case.is_debtor == True)
+        # Search in all batches and standalone debtors for companies matching the query
+        matching_cases = Case.query.join(Case.company).options(
+            contains_eager(Case.company),
+            joinedload(Case.batch)
+        ).filter(
+            Case.user_id == session['user_id'],
+            (Case.batch_id.isnot(None)) | (Case.is_debtor == True),
+            name_contains(Company.company_name, search_query)
+        ).order_by(Company.company_name).limit(
+            current_app.config.get('DEBTOR_SEARCH_LIMIT', 100)
         ).all()
         
-        for case in all_cases:
-            if search_query.lower() in case.company.company_name.lower():
-                search_results.append({
-                    'case': case,
-                    'batch': case.batch if case.batch_id else None
-                })
+        search_results = [
+            {'case': case, 'batch': case.batch if case.batch_id else None}
+            for case in matching_cases
+        ]
     
     return render_template("debtors.html", 
                          user=user, 
                          batches=batches,
+                         batch_case_counts=batch_case_counts,
                          standalone_debtors=standalone_debtors,
                          search_query=search_query,
                          search_results=search_results)
@@ -252,7 +273,7 @@ def add_debtor(company_id):
     user_id = session.get("user_id")
     if not user_id:
         return redirect(url_for("main.login"))
-
+    
     if request.method == "GET":
         # Show form to select batch or create new one
         batches = DebtorBatch.query.filter_by(user_id=user_id).order_by(DebtorBatch.created_at.desc()).all()
@@ -308,7 +329,7 @@ def add_debtor(company_id):
 
 @main.route("/upload_csv", methods=["GET", "POST"])
 def upload_csv():
-    """Upload CSV file with VAT numbers to create a batch"""
+    """Upload a CSV/TXT or XLSX file with VAT numbers to create a batch"""
     user_id = session.get("user_id")
     if not user_id:
         return redirect(url_for("main.login"))
@@ -329,6 +350,30 @@ def upload_csv():
     batch_name = request.form.get("batch_name", f"Batch {datetime.now().strftime('%Y-%m-%d %H:%M')}")
     batch_description = request.form.get("batch_description", "")
     
+    # Stream the upload row by row (CSV/TXT with sniffed delimiter, or XLSX);
+    # normalize, validate (checksum) and remove duplicates while preserving order
+    try:
+        vat_numbers, invalid_count, invalid_examples = collect_vats(iter_upload_vats(file))
+    except (csv.Error, UnreadableUpload, ValueError) as e:
+        current_app.logger.warning(f"Unreadable upload {file.filename}: {e}")
+        flash("Bestand kon niet gelezen worden. Upload een CSV, TXT of XLSX bestand met BTW-nummers", "danger")
+        return redirect(url_for("main.upload_csv"))
+    
+    if invalid_count:
+        flash(f"{invalid_count} ongeldige BTW-nummers overgeslagen: {', '.join(invalid_examples)}", "warning")
+    
+    if not vat_numbers:
+        flash("Waarschuwing: Geen geldige BTW-nummers gevonden in het bestand", "warning")
+        return redirect(url_for("main.upload_csv"))
+    
+    # Same upload as an import that stopped halfway: continue it instead of starting over
+    stopped_job = find_resumable_import(user_id, vat_numbers)
+    if stopped_job:
+        resume_import(stopped_job)
+        db.session.commit()
+        flash(f"Deze import was eerder gestopt en wordt hervat vanaf BTW-nummer {stopped_job.processed + 1} van {stopped_job.total}", "success")
+        return redirect(url_for("main.batch_detail", batch_id=stopped_job.batch_id))
+    
     # Create batch
     batch = DebtorBatch(
         batch_name=batch_name,
@@ -338,129 +383,11 @@ def upload_csv():
     db.session.add(batch)
     db.session.flush()
     
-    # Read CSV file
-    try:
-        file_content = file.stream.read().decode("UTF-8")
-    except UnicodeDecodeError:
-        # Try with a different encoding if UTF-8 fails
-        file.stream.seek(0)
-        file_content = file.stream.read().decode("latin-1")
-    
-    # Parse VAT numbers (handle both comma-separated, semicolon-separated, and line-separated)
-    vat_numbers = []
-    
-    # Split by newlines first
-    lines = file_content.replace('\r\n', '\n').replace('\r', '\n').split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        # Check if line contains commas or semicolons (CSV format)
-        if ',' in line or ';' in line:
-            # Split by both comma and semicolon
-            separators = [',', ';']
-            parts = [line]
-            for sep in separators:
-                new_parts = []
-                for part in parts:
-                    new_parts.extend(part.split(sep))
-                parts = new_parts
-            
-            # Process each value
-            for vat in parts:
-                vat = vat.strip()
-                # Remove quotes if present (from Excel CSV)
-                vat = vat.strip('"').strip("'").strip()
-                if vat and not vat.lower().startswith('vat'):  # Skip header if present
-                    vat_numbers.append(vat)
-        else:
-            # Single VAT per line
-            vat = line.strip('"').strip("'").strip()
-            if vat and not vat.lower().startswith('vat'):
-                vat_numbers.append(vat)
-    
-    # Remove duplicates while preserving order
-    vat_numbers = list(dict.fromkeys(vat_numbers))
-    
-    # Process each VAT number
-    success_count = 0
-    error_list = []
-    
-    for vat in vat_numbers:
-        try:
-            # Clean VAT number
-            clean_vat = f"BE{vat.replace('BE', '').replace(' ', '').replace('.', '').replace('-', '')}"
-            
-            # Fetch data from API
-            api_data = get_company_financials(clean_vat)
-            
-            # Find or create company
-            company = Company.query.filter_by(vat_number=clean_vat).first()
-            if not company:
-                company = Company(vat_number=clean_vat)
-            
-            # Update with API data
-            company.company_name = api_data.get('company_name')
-            company.company_address = api_data.get('company_address')
-            company.established_since = api_data.get('established_since')
-            company.revenue_estimation = api_data.get('revenue_estimation')
-            company.employee_estimation = api_data.get('employee_estimation')
-            company.common_score = api_data.get('common_score')
-            company.credit_limit = api_data.get('credit_limit')
-            company.credit_score = api_data.get('credit_score')
-            company.solvency_ratio = api_data.get('solvency_ratio')
-            company.debt_ratio = api_data.get('debt_ratio')
-            company.current_ratio = api_data.get('current_ratio')
-            company.quick_ratio = api_data.get('quick_ratio')
-            company.cash = api_data.get('cash')
-            company.ebitda = api_data.get('ebitda')
-            company.net_profit = api_data.get('net_profit')
-            company.total_assets = api_data.get('total_assets')
-            company.equity = api_data.get('equity')
-            company.total_debt = api_data.get('total_debt')
-            
-            db.session.add(company)
-            db.session.flush()
-            
-            # Check if this company is already in the batch (skip duplicates)
-            existing_case = Case.query.filter_by(
-                company_id=company.company_id,
-                batch_id=batch.batch_id
-            ).first()
-            
-            if existing_case:
-                # Skip this company, already in batch
-                continue
-            
-            # Create case for this company in the batch
-            case = Case(
-                company_id=company.company_id,
-                user_id=user_id,
-                batch_id=batch.batch_id,
-                amount=0,
-                status='pending',
-                is_debtor=False  # Part of batch, not standalone
-            )
-            db.session.add(case)
-            success_count += 1
-            
-        except Exception as e:
-            error_list.append(f"{vat}: {str(e)}")
-    
+    # Enrichment and case creation happen in the import worker
+    job = enqueue_import(batch, user_id, vat_numbers)
     db.session.commit()
     
-    # Provide feedback
-    if success_count == 0:
-        flash(f"Waarschuwing: Geen bedrijven toegevoegd. Gevonden BTW-nummers: {', '.join(vat_numbers[:5]) if vat_numbers else 'Geen'}", "warning")
-        if error_list:
-            for error in error_list[:5]:  # Show first 5 errors
-                flash(f"Fout: {error}", "danger")
-    else:
-        flash(f"Batch '{batch_name}' aangemaakt met {success_count} bedrijven", "success")
-        if error_list:
-            flash(f"Fouten bij {len(error_list)} bedrijven: {', '.join(error_list[:3])}", "warning")
+    flash(f"Batch '{batch_name}' aangemaakt: {len(vat_numbers)} BTW-nummers worden op de achtergrond verwerkt (import #{job.job_id})", "success")
     
     return redirect(url_for("main.batch_detail", batch_id=batch.batch_id))
 
@@ -479,26 +406,106 @@ def batch_detail(batch_id):
         flash("Geen toegang tot deze batch", "danger")
         return redirect(url_for("main.debtors"))
     
-    # Get cases in this batch
-    cases = Case.query.filter_by(batch_id=batch_id).all()
+    # Risk summary over the whole batch, not just the first page
+    score_counts = batch_score_counts(batch_id)
+    total_cases = sum(score_counts.values())
+    
+    sort = request.args.get("sort", "visit")
+    if sort == 'route' and route_too_large(total_cases):
+        flash(f"Een route wordt gepland voor maximaal {current_app.config.get('ROUTE_MAX_STOPS', 500)} bedrijven, "
+              f"deze batch staat in bezoekvolgorde", "warning")
+        sort = 'visit'
     
-    # Sort by quick ratio (higher = better liquidity = visit first)
-    # Then by cash on hand (higher = more money available)
-    sorted_cases = sorted(cases, key=lambda c: (
-        -(float(c.company.quick_ratio) if c.company.quick_ratio else -999),  # Higher quick ratio first
-        -(float(c.company.cash) if c.company.cash else -999)  # Higher cash first
-    ))
+    # First page of cases, sorted in SQL by quick ratio (higher = better liquidity = visit first)
+    # then by cash on hand (higher = more money available); the rest is loaded on scroll
+    cases, next_cursor = batch_cases_page(batch_id, limit=current_app.config.get('BATCH_PAGE_SIZE', 100), sort=sort)
     
-    return render_template("batch_detail.html", batch=batch, cases=sorted_cases)
+    # Planned visit route summary (distance, addresses without known postal code)
+    route = batch_route(batch_id) if sort == 'route' else None
+    
+    # Latest CSV import for this batch (shown as progress while it runs, with a resume button when it stopped)
+    import_job = ImportJob.query.filter_by(batch_id=batch_id).order_by(ImportJob.job_id.desc()).first()
+    
+    return render_template("batch_detail.html", batch=batch, cases=cases, next_cursor=next_cursor, sort=sort,
+                           score_counts=score_counts, total_cases=total_cases,
+                           route=route, import_job=import_job, import_resumable=is_resumable(import_job))
+
+
+@main.route("/batch/<int:batch_id>/cases")
+def batch_cases_feed(batch_id):
+    """Next page of batch cases for infinite scroll (keyset pagination on ?after=<case_id>&sort=...)"""
+    import uuid as uuid_lib
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Niet ingelogd"}), 401
+    
+    batch = DebtorBatch.query.get_or_404(batch_id)
+    
+    # Security check
+    if str(batch.user_id) != str(user_id):
+        return jsonify({"error": "Geen toegang"}), 403
+    
+    try:
+        after = uuid_lib.UUID(request.args["after"]) if request.args.get("after") else None
+    except ValueError:
+        return jsonify({"error": "Ongeldige cursor"}), 400
+    
+    limit = min(request.args.get("limit", current_app.config.get('BATCH_PAGE_SIZE', 100), type=int), 500)
+    cases, next_cursor = batch_cases_page(batch_id, after=after, limit=limit, sort=request.args.get("sort", "visit"))
+    
+    return jsonify({
+        "html": "".join(render_template("components/batch_case_row.html", case=case) for case in cases),
+        "count": len(cases),
+        "next_cursor": str(next_cursor) if next_cursor else None
+    })
+
+
+@main.route("/import_jobs/<int:job_id>")
+def import_job_status(job_id):
+    """Progress of a CSV import as JSON (polled by batch_detail)"""
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Niet ingelogd"}), 401
+    
+    job = ImportJob.query.get_or_404(job_id)
+    
+    # Security check
+    if str(job.user_id) != str(user_id):
+        return jsonify({"error": "Geen toegang"}), 403
+    
+    return jsonify(dict(job.to_dict(), resumable=is_resumable(job)))
+
+
+@main.route("/import_jobs/<int:job_id>/resume", methods=["POST"])
+def resume_import_job(job_id):
+    """Continue a stopped CSV import after its last processed chunk"""
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("main.login"))
+    
+    job = ImportJob.query.get_or_404(job_id)
+    
+    # Security check
+    if str(job.user_id) != str(user_id):
+        flash("Geen toegang tot deze import", "danger")
+        return redirect(url_for("main.debtors"))
+    
+    if not is_resumable(job):
+        flash("Deze import kan niet hervat worden", "warning")
+    else:
+        resume_import(job)
+        db.session.commit()
+        flash(f"Import hervat vanaf BTW-nummer {job.processed + 1} van {job.total}", "success")
+    
+    if not batch_exists(job.batch_id):
+        return redirect(url_for("main.debtors"))
+    return redirect(url_for("main.batch_detail", batch_id=job.batch_id))
 
 
 @main.route("/batch/<int:batch_id>/export_pdf")
 def export_batch_pdf(batch_id):
-    """Export batch to PDF"""
-    from xhtml2pdf import pisa
-    from flask import make_response
-    from datetime import datetime
-    from io import BytesIO
+    """Export batch to PDF: served from the PDF cache, otherwise rendered in the background"""
+    from flask import make_response, send_file
     
     user_id = session.get("user_id")
     if not user_id:
@@ -512,37 +519,160 @@ def export_batch_pdf(batch_id):
         flash("Geen toegang tot deze batch", "danger")
         return redirect(url_for("main.debtors"))
     
-    # Get cases using ORM
-    cases = Case.query.filter_by(batch_id=batch_id).all()
+    # Cases sorted by quick ratio + cash (default), solvency score (?sort=score),
+    # a weight profile (?sort=balanced, see scoring.py) or as a visit route (?sort=route, small batches)
+    sort = batch_sort(batch_id, request.args.get("sort", "visit"))
+    filename = f"batch_{batch.batch_name.replace(' ', '_')}.pdf"
+    
+    # Same batch content = same key: answer with 304 or the cached file, no rendering
+    cache_key = pdf_cache_key(batch, sort)
+    if cache_key in request.if_none_match:
+        response = make_response("", 304)
+        response.set_etag(cache_key)
+        return response
+    
+    cached_path = cached_pdf_path(batch_id, cache_key)
+    if cached_path:
+        return send_pdf(send_file(cached_path, mimetype="application/pdf", as_attachment=True,
+                                  download_name=filename, etag=False), cache_key)
+    
+    # Without a PDF cache there is nothing to poll for: render in the pool and wait
+    if not pdf_cache_dir():
+        response = make_response(render_batch_pdf_now(batch, sort))
+        response.headers["Content-Type"] = "application/pdf"
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+        return send_pdf(response, cache_key)
+    
+    # Render in a worker process; the page polls until the file is in the cache
+    start_batch_pdf(batch, sort, cache_key)
+    if render_state(batch_id, cache_key) == 'failed':
+        current_app.logger.error(f"PDF of batch {batch_id} failed: {forget_failed_render(cache_key)}")
+        flash("PDF kon niet worden aangemaakt, probeer opnieuw", "danger")
+        return redirect(url_for("main.batch_detail", batch_id=batch_id, sort=sort))
+    
+    return render_template("pdf_pending.html",
+                           title=f"PDF van {batch.batch_name}",
+                           back_url=url_for("main.batch_detail", batch_id=batch_id, sort=sort),
+                           status_url=url_for("main.export_batch_pdf_status", batch_id=batch_id, sort=sort),
+                           download_url=url_for("main.export_batch_pdf", batch_id=batch_id, sort=sort)), 202
+
+
+@main.route("/batch/<int:batch_id>/export_pdf/status")
+def export_batch_pdf_status(batch_id):
+    """Render status of a batch PDF (polled by pdf_pending.html)"""
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Niet ingelogd"}), 401
+    
+    batch = DebtorBatch.query.get_or_404(batch_id)
+    
+    # Security check
+    if str(batch.user_id) != str(user_id):
+        return jsonify({"error": "Geen toegang"}), 403
     
-    # Sort by quick ratio (primary) then cash (secondary)
-    sorted_cases = sorted(cases, key=lambda c: (
-        -(float(c.company.quick_ratio) if c.company.quick_ratio else -999),
-        -(float(c.company.cash) if c.company.cash else -999)
-    ))
+    state = render_state(batch_id, pdf_cache_key(batch, request.args.get("sort", "visit")))
+    return jsonify({"status": state or "missing", "ready": state == "ready"})
+
+
+@main.route("/batches/export_zip")
+def export_batches_zip():
+    """Export several batches as one ZIP of PDFs, rendered in parallel in the worker processes"""
+    from flask import send_file
     
-    # Render HTML template
-    html_string = render_template("batch_pdf.html", 
-                                 batch=batch, 
-                                 cases=sorted_cases,
-                                 export_date=datetime.now())
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("main.login"))
     
-    # Convert to PDF
-    pdf_file = BytesIO()
-    pisa.CreatePDF(html_string, dest=pdf_file)
-    pdf_file.seek(0)
+    sort = request.args.get("sort", "visit")
+    batch_ids = request.args.getlist("batch_ids", type=int)
     
-    # Return as download
-    response = make_response(pdf_file.read())
-    response.headers["Content-Type"] = "application/pdf"
-    response.headers["Content-Disposition"] = f"attachment; filename=batch_{batch.batch_name.replace(' ', '_')}.pdf"
+    # Security check: only the user's own batches
+    batches = [
+        batch for batch in DebtorBatch.query.filter(
+            DebtorBatch.batch_id.in_(batch_ids)
+        ).order_by(DebtorBatch.batch_name).all()
+        if str(batch.user_id) == str(user_id)
+    ]
     
+    if not batches:
+        flash("Selecteer minstens één batch om te exporteren", "warning")
+        return redirect(url_for("main.debtors"))
+    
+    if not pdf_cache_dir():
+        flash("ZIP-export vereist een PDF cache (PDF_CACHE_DIR)", "danger")
+        return redirect(url_for("main.debtors"))
+    
+    # Start every missing PDF at once; the pool renders them in parallel
+    keys = {}
+    for batch in batches:
+        batch_pdf_sort = batch_sort(batch.batch_id, sort)
+        keys[batch.batch_id] = pdf_cache_key(batch, batch_pdf_sort)
+        start_batch_pdf(batch, batch_pdf_sort, keys[batch.batch_id])
+    
+    states = {batch_id: render_state(batch_id, key) for batch_id, key in keys.items()}
+    failed = [batch for batch in batches if states[batch.batch_id] == 'failed']
+    if failed:
+        for batch in failed:
+            current_app.logger.error(f"PDF of batch {batch.batch_id} failed: {forget_failed_render(keys[batch.batch_id])}")
+        flash(f"PDF kon niet worden aangemaakt voor: {', '.join(b.batch_name for b in failed)}", "danger")
+        return redirect(url_for("main.debtors"))
+    
+    if any(state != 'ready' for state in states.values()):
+        ready = sum(1 for state in states.values() if state == 'ready')
+        return render_template("pdf_pending.html",
+                               title=f"{len(batches)} batches ({ready} klaar)",
+                               back_url=url_for("main.debtors"),
+                               status_url=url_for("main.export_batches_zip_status", batch_ids=batch_ids, sort=sort),
+                               download_url=url_for("main.export_batches_zip", batch_ids=batch_ids, sort=sort)), 202
+    
+    # All PDFs are cached: the ZIP is just a copy (stored, PDFs are compressed already)
+    zip_file = io.BytesIO()
+    with zipfile.ZipFile(zip_file, "w", zipfile.ZIP_STORED) as archive:
+        for batch in batches:
+            archive.write(cached_pdf_path(batch.batch_id, keys[batch.batch_id]),
+                          f"batch_{batch.batch_id}_{batch.batch_name.replace(' ', '_')}.pdf")
+    zip_file.seek(0)
+    
+    return send_file(zip_file, mimetype="application/zip", as_attachment=True,
+                     download_name=f"batches_{datetime.now().strftime('%Y%m%d')}.zip")
+
+
+@main.route("/batches/export_zip/status")
+def export_batches_zip_status():
+    """Render status of a multi-batch ZIP export (polled by pdf_pending.html)"""
+    user_id = session.get("user_id")
+    if not user_id:
+        return jsonify({"error": "Niet ingelogd"}), 401
+    
+    sort = request.args.get("sort", "visit")
+    batches = [
+        batch for batch in DebtorBatch.query.filter(
+            DebtorBatch.batch_id.in_(request.args.getlist("batch_ids", type=int))
+        ).all()
+        if str(batch.user_id) == str(user_id)
+    ]
+    
+    states = [
+        render_state(batch.batch_id, pdf_cache_key(batch, batch_sort(batch.batch_id, sort))) for batch in batches
+    ]
+    return jsonify({
+        "status": "failed" if "failed" in states else "ready" if all(s == "ready" for s in states) else "running",
+        "ready": all(s == "ready" for s in states),
+        "done": states.count("ready"),
+        "total": len(states)
+    })
+
+
+def send_pdf(response, cache_key):
+    """ETag = PDF cache key; the browser must revalidate, so changes show up immediately"""
+    response.set_etag(cache_key)
+    response.headers["Cache-Control"] = "private, no-cache"
     return response
 
 
 @main.route("/batch/<int:batch_id>/delete", methods=["POST"])
 def delete_batch(batch_id):
-    """Delete an entire batch and all its cases"""
+    """Delete an entire batch and all its cases (soft delete, purged later by flask purge-deleted)"""
     user_id = session.get("user_id")
     if not user_id:
         return redirect(url_for("main.login"))
@@ -555,12 +685,15 @@ def delete_batch(batch_id):
         return redirect(url_for("main.debtors"))
     
     batch_name = batch.batch_name
+    deleted_at = datetime.utcnow()
     
-    # Delete all cases in this batch
-    Case.query.filter_by(batch_id=batch_id).delete()
+    # Mark all cases in this batch as deleted (cases deleted before keep their date)
+    Case.query.filter(Case.batch_id == batch_id, Case.deleted_at.is_(None)).update(
+        {Case.deleted_at: deleted_at}, synchronize_session=False
+    )
     
-    # Delete the batch
-    db.session.delete(batch)
+    # Mark the batch as deleted
+    batch.deleted_at = deleted_at
     db.session.commit()
     
     flash(f"Batch '{batch_name}' verwijderd", "success")
@@ -569,7 +702,7 @@ def delete_batch(batch_id):
 
 @main.route("/debtor/<case_id>/delete", methods=["POST"])
 def delete_debtor(case_id):
-    """Delete a single debtor (case)"""
+    """Delete a single debtor (case), as a soft delete"""
     import uuid as uuid_lib
     user_id = session.get("user_id")
     if not user_id:
@@ -592,7 +725,7 @@ def delete_debtor(case_id):
     batch_id = case.batch_id
     company_name = case.company.company_name
     
-    db.session.delete(case)
+    case.deleted_at = datetime.utcnow()
     db.session.commit()
     
     flash(f"'{company_name}' verwijderd", "success")
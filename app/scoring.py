@@ -0,0 +1,138 @@
+import numpy as np
+from .models import db, Case, Company, QUICK_RATIO_SORT_KEY, CASH_SORT_KEY
+
+# Financial columns loaded per case, in array order
+METRIC_COLUMNS = {
+    'quick_ratio': Company.quick_ratio,
+    'cash': Company.cash,
+    'current_ratio': Company.current_ratio,
+    'solvency_ratio': Company.solvency_ratio,
+    'debt_ratio': Company.debt_ratio,
+    'credit_score': Company.credit_score,
+    'common_score': Company.common_score,
+}
+
+# common_score (A = lowest risk) as a 0..1 value
+COMMON_SCORE_VALUES = {'A': 1.0, 'B': 0.75, 'C': 0.5, 'D': 0.25, 'E': 0.0}
+
+# Weight profiles: component -> weight. Components are percentile ranks within
+# the batch (0..1, missing = 0), so weights work regardless of units.
+WEIGHT_PROFILES = {
+    'liquidity': {'quick_ratio': 0.6, 'cash': 0.4},
+    'solvency': {'solvency': 1.0},
+    'balanced': {'solvency': 0.4, 'quick_ratio': 0.3, 'cash': 0.2, 'common_score': 0.1},
+}
+
+
+class BatchMetrics:
+    """Financial columns of a set of cases as float arrays (NaN = missing)"""
+    
+    def __init__(self, case_ids, columns):
+        self.case_ids = case_ids
+        self.columns = columns
+    
+    def __len__(self):
+        return len(self.case_ids)
+    
+    def __getitem__(self, name):
+        return self.columns[name]
+
+
+def to_array(values):
+    """Numbers (Decimal/float/None) as a float array with NaN for None"""
+    return np.fromiter((np.nan if v is None else float(v) for v in values), dtype=float, count=len(values))
+
+
+def load_metrics(query_filter):
+    """BatchMetrics for the cases matching query_filter, in visit order (ties in rankings keep it)"""
+    rows = db.session.query(Case.case_id, *METRIC_COLUMNS.values()).join(Case.company).filter(
+        query_filter
+    ).order_by(
+        QUICK_RATIO_SORT_KEY.desc(), CASH_SORT_KEY.desc(), Case.case_id.desc()
+    ).all()
+    
+    case_ids = [row[0] for row in rows]
+    values = list(zip(*rows))[1:] if rows else [()] * len(METRIC_COLUMNS)
+    
+    columns = {}
+    for name, column_values in zip(METRIC_COLUMNS, values):
+        if name == 'common_score':
+            column_values = [COMMON_SCORE_VALUES.get(v) for v in column_values]
+        columns[name] = to_array(column_values)
+    return BatchMetrics(case_ids, columns)
+
+
+def batch_metrics(batch_id):
+    """BatchMetrics for all cases in a batch"""
+    return load_metrics(Case.batch_id == batch_id)
+
+
+def portfolio_metrics(user_id):
+    """BatchMetrics for all cases (batches and standalone debtors) of a user"""
+    return load_metrics(Case.user_id == user_id)
+
+
+# =====================================================
+# VECTORISED SCORES
+# =====================================================
+
+def solvency_scores(solvency_ratio, debt_ratio, credit_score):
+    """Company.calculate_solvency_score for whole arrays (NaN where a metric is missing or 0)"""
+    score = np.round(solvency_ratio * 0.5 + (100 - debt_ratio) * 0.3 + (credit_score / 10) * 0.2, 2)
+    missing = np.zeros(score.shape, dtype=bool)
+    for values in (solvency_ratio, debt_ratio, credit_score):
+        missing |= np.isnan(values) | (values == 0)
+    score[missing] = np.nan
+    return score
+
+
+def percentile_ranks(values):
+    """Rank of each value within the array as 0..1 (ties share their average rank, NaN -> 0)"""
+    ranks = np.zeros(values.shape)
+    present = ~np.isnan(values)
+    known = np.sort(values[present])
+    if len(known) == 1:
+        ranks[present] = 1.0
+    elif len(known) > 1:
+        low = np.searchsorted(known, values[present], side='left')
+        high = np.searchsorted(known, values[present], side='right')
+        ranks[present] = (low + high - 1) / 2 / (len(known) - 1)
+    return ranks
+
+
+def score_components(metrics):
+    """Component name -> 0..1 array, the building blocks for weight profiles"""
+    solvency = solvency_scores(metrics['solvency_ratio'], metrics['debt_ratio'], metrics['credit_score'])
+    return {
+        'quick_ratio': percentile_ranks(metrics['quick_ratio']),
+        'cash': percentile_ranks(metrics['cash']),
+        'current_ratio': percentile_ranks(metrics['current_ratio']),
+        'solvency': percentile_ranks(solvency),
+        'common_score': np.nan_to_num(metrics['common_score'], nan=0.0),
+    }
+
+
+def composite_scores(metrics, weights):
+    """Weighted composite score per case, 0..100"""
+    components = score_components(metrics)
+    unknown = set(weights) - set(components)
+    if unknown:
+        raise ValueError(f"Unknown score components: {', '.join(sorted(unknown))}")
+    
+    total = sum(weights.values())
+    scores = np.zeros(len(metrics))
+    if not total:
+        return scores
+    for name, weight in weights.items():
+        scores += components[name] * weight
+    return scores * (100 / total)
+
+
+def rank_cases(metrics, profile='balanced'):
+    """(case_ids, scores) ordered best first; profile is a WEIGHT_PROFILES name or a weights dict"""
+    weights = WEIGHT_PROFILES[profile] if isinstance(profile, str) else profile
+    scores = composite_scores(metrics, weights)
+    
+    # Stable sort keeps visit order between equal scores
+    order = np.argsort(-scores, kind='stable')
+    return [metrics.case_ids[i] for i in order], scores[order]
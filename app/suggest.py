@@ -0,0 +1,197 @@
+import re
+import time
+import threading
+import unicodedata
+from bisect import bisect_left
+from datetime import datetime
+from .models import db, Company
+
+# Index at most this many word starts per name ("Bakkerij Janssens en Zonen NV")
+MAX_WORDS = 4
+
+# Keys examined per lookup, keeps short prefixes ('a') as fast as long ones
+MAX_SCAN = 500
+
+
+def normalize_text(value):
+    """Lowercase and strip accents so 'Liège' matches 'liege'"""
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower().strip()
+
+
+def normalize_query(query):
+    """Query as stored in the index: VAT-like input loses its BE prefix and separators"""
+    compact = re.sub(r"[\s.\-/]", "", query).lower()
+    if compact.startswith("be") and compact[2:].isdigit() and len(compact) > 2:
+        return compact[2:]
+    if compact.isdigit():
+        return compact
+    return normalize_text(query)
+
+
+class PrefixIndex:
+    """In-memory prefix index over company names and VAT numbers
+    
+    Keys live in one sorted list, so a prefix lookup is a bisect plus a short
+    scan. Each name is indexed from every word start, each VAT with and
+    without its leading 0.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = []  # Sorted index keys
+        self.key_ids = []  # company_id for each key, same positions as keys
+        self.companies = {}  # company_id -> (company_name, vat_number, keys)
+        self.synced_at = None
+        self.built_at = None
+    
+    def _keys_for(self, company_name, vat_number):
+        keys = set()
+        name = normalize_text(company_name)
+        words = name.split()
+        for i in range(min(len(words), MAX_WORDS)):
+            keys.add(" ".join(words[i:]))
+        
+        digits = re.sub(r"\D", "", vat_number or "")
+        if digits:
+            keys.add(digits)
+            keys.add(digits.lstrip("0"))
+        keys.discard("")
+        return keys
+    
+    def _remove(self, company_id):
+        entry = self.companies.pop(company_id, None)
+        if entry is None:
+            return
+        for key in entry[2]:
+            i = bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key:
+                if self.key_ids[i] == company_id:
+                    del self.keys[i]
+                    del self.key_ids[i]
+                    break
+                i += 1
+    
+    def add(self, company_id, company_name, vat_number):
+        """Insert or update one company"""
+        keys = self._keys_for(company_name, vat_number)
+        with self.lock:
+            self._remove(company_id)
+            self.companies[company_id] = (company_name, vat_number, keys)
+            for key in keys:
+                i = bisect_left(self.keys, key)
+                self.keys.insert(i, key)
+                self.key_ids.insert(i, company_id)
+    
+    def remove(self, company_id):
+        """Drop one company (deleted)"""
+        with self.lock:
+            self._remove(company_id)
+    
+    def build(self, rows):
+        """Replace the whole index with (company_id, company_name, vat_number) rows"""
+        companies = {}
+        pairs = []
+        for company_id, company_name, vat_number in rows:
+            keys = self._keys_for(company_name, vat_number)
+            companies[company_id] = (company_name, vat_number, keys)
+            pairs.extend((key, company_id) for key in keys)
+        pairs.sort()
+        
+        with self.lock:
+            self.companies = companies
+            self.keys = [key for key, _ in pairs]
+            self.key_ids = [company_id for _, company_id in pairs]
+    
+    def search(self, query, limit=8):
+        """Companies with a name/word/VAT starting with query; whole-name matches first"""
+        prefix = normalize_query(query)
+        if not prefix:
+            return []
+        
+        first, rest = [], []
+        seen = set()
+        with self.lock:
+            i = bisect_left(self.keys, prefix)
+            end = min(len(self.keys), i + MAX_SCAN)
+            while i < end and self.keys[i].startswith(prefix) and len(first) < limit:
+                company_id = self.key_ids[i]
+                i += 1
+                if company_id in seen:
+                    continue
+                seen.add(company_id)
+                
+                company_name, vat_number, _ = self.companies[company_id]
+                match = {"company_id": company_id, "company_name": company_name, "vat_number": vat_number}
+                if normalize_text(company_name).startswith(prefix):
+                    first.append(match)
+                else:
+                    rest.append(match)
+        
+        return (first + rest)[:limit]
+    
+    def __len__(self):
+        return len(self.companies)
+
+
+suggest_index = PrefixIndex()
+
+
+def add_after_commit(session, company_id, company_name, vat_number):
+    """Add a company to the index once the session commits (forgotten on rollback)"""
+    session.info.setdefault('suggest_pending', []).append((company_id, company_name, vat_number))
+
+
+@db.event.listens_for(db.session, 'after_commit')
+def add_committed_companies(session):
+    pending = session.info.pop('suggest_pending', None)
+    # A process that never built the index (import worker) loads them on its first build anyway
+    if pending and suggest_index.synced_at is not None:
+        for company_id, company_name, vat_number in pending:
+            suggest_index.add(company_id, company_name, vat_number)
+
+
+@db.event.listens_for(db.session, 'after_rollback')
+def forget_pending_companies(session):
+    session.info.pop('suggest_pending', None)
+
+
+def build_suggest_index():
+    """Load every company into the index (at startup, then every rebuild_age)"""
+    started = time.monotonic()
+    suggest_index.build(
+        db.session.query(Company.company_id, Company.company_name, Company.vat_number)
+    )
+    suggest_index.synced_at = suggest_index.built_at = time.time()
+    return time.monotonic() - started
+
+
+def sync_suggest_index(max_age, rebuild_age):
+    """Pick up changes by other processes (import worker, purge job)
+    
+    Every max_age: companies created or deleted since the last sync. Every
+    rebuild_age: a full rebuild, which also picks up renamed companies (there is
+    no updated_at column to sync them on).
+    """
+    now = time.time()
+    if suggest_index.built_at is None or now - suggest_index.built_at >= rebuild_age:
+        build_suggest_index()
+        return
+    if now - suggest_index.synced_at < max_age:
+        return
+    
+    # created_at and deleted_at are naive UTC; the extra max_age margin covers slow commits
+    since = datetime.utcfromtimestamp(suggest_index.synced_at - max_age)
+    suggest_index.synced_at = now
+    rows = db.session.query(Company.company_id, Company.company_name, Company.vat_number).filter(
+        Company.created_at >= since
+    )
+    for company_id, company_name, vat_number in rows:
+        suggest_index.add(company_id, company_name, vat_number)
+    
+    # Purged companies were soft-deleted first, so they are dropped here too
+    deleted = db.session.query(Company.company_id).filter(
+        Company.deleted_at >= since
+    ).execution_options(include_deleted=True)
+    for (company_id,) in deleted:
+        suggest_index.remove(company_id)
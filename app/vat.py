@@ -0,0 +1,69 @@
+import re
+
+# Characters people put in VAT numbers for readability: spaces, dots, hyphens, slashes
+_SEPARATORS = re.compile(r"[\s.\-/]")
+
+
+class InvalidVatError(ValueError):
+    """Raised for VAT numbers that can never exist (wrong format or check digits)"""
+
+
+def _compact(value):
+    """Uppercase and strip separators and the optional BE prefix"""
+    compact = _SEPARATORS.sub("", str(value)).upper()
+    if compact.startswith("BE"):
+        compact = compact[2:]
+    return compact
+
+
+def looks_like_vat(value):
+    """True when a search query is meant as a VAT number (BE prefix or 9/10 digits)"""
+    compact = _SEPARATORS.sub("", str(value)).upper()
+    return bool(re.fullmatch(r"(BE)?\d{9,10}", compact)) or (compact.startswith("BE") and compact[2:].isdigit())
+
+
+def normalize_vat(value):
+    """Normalize and validate a Belgian VAT number, returns 'BE' + 10 digits
+    
+    Accepts 'BE 0403.170.701', '0403170701', '403170701', ... The last two
+    digits must equal 97 - (first eight digits mod 97).
+    """
+    digits = _compact(value)
+    
+    if not digits.isdigit():
+        raise InvalidVatError(f"Ongeldig Belgisch BTW-nummer: {value}")
+    
+    # Legacy 9-digit form: the leading 0 was dropped
+    if len(digits) == 9:
+        digits = "0" + digits
+    
+    if len(digits) != 10 or digits[0] not in "01":
+        raise InvalidVatError(f"Ongeldig Belgisch BTW-nummer: {value}")
+    
+    if 97 - int(digits[:8]) % 97 != int(digits[8:]):
+        raise InvalidVatError(f"Ongeldig Belgisch BTW-nummer: {value} (controlegetal klopt niet)")
+    
+    return f"BE{digits}"
+
+
+def validate_vats(values):
+    """Validate many VAT numbers at once, values are (label, value) pairs
+    
+    Returns (valid, invalid): valid is the list of normalized VATs without
+    duplicates (input order kept), invalid a list of (label, value, error message).
+    The label (e.g. a line number) only travels along with invalid values.
+    """
+    valid = {}
+    invalid = []
+    for label, value in values:
+        try:
+            valid.setdefault(normalize_vat(value), None)
+        except InvalidVatError as e:
+            invalid.append((label, value, str(e)))
+    return list(valid), invalid
+
+
+def clean_vat_number(vat_number):
+    """VAT number as bizzy.ai expects it: 9 digits (leading 0 dropped) or 10 digits starting with 1"""
+    digits = normalize_vat(vat_number)[2:]
+    return digits[1:] if digits.startswith("0") else digits
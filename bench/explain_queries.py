@@ -0,0 +1,202 @@
+"""Query plans for the SQL behind the main routes
+
+Seeds a database with a large dataset (many users, each with batches and
+standalone debtors), requests each route once, captures the SELECT statements
+it runs and prints the plan of every statement. Shows whether the indexes in
+models.py are used, or whether a full scan of cases crept in.
+
+EXPLAIN ANALYZE needs Postgres: pass an empty throw-away database with
+--database-url (tables are created with db.create_all, so indexes that only
+exist in migrations, like the trigram index, are missing). Without it a
+temporary SQLite database is used and EXPLAIN QUERY PLAN is printed instead.
+
+Usage:
+    python bench/explain_queries.py [--database-url postgresql://localhost/solvio_bench]
+                                    [--users 20 --batches 10 --cases 250 --debtors 100]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from query_counts import QueryCounter, count_queries  # noqa: E402  (bench/ is on sys.path)
+
+PLACES = ["1000, Brussel", "2000, Antwerpen", "3000, Leuven", "8000, Brugge", "9000, Gent", "4000, Liège"]
+
+# Plan fragments that mean a full scan of a big table
+FULL_SCANS = ["Seq Scan on cases", "Seq Scan on companies", "SCAN cases", "SCAN companies"]
+
+
+class StatementRecorder(QueryCounter):
+    """QueryCounter that also keeps the parameters, to replay statements under EXPLAIN"""
+
+    def __init__(self):
+        super().__init__()
+        self.parameters = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        super().__call__(conn, cursor, statement, parameters, context, executemany)
+        self.parameters.append(parameters)
+
+
+def insert_rows(db, table, rows, chunk_size=5000):
+    for start in range(0, len(rows), chunk_size):
+        db.session.execute(table.insert(), rows[start:start + chunk_size])
+
+
+def seed(db, models, users, batches, cases, debtors):
+    """Bulk-insert the dataset, returns (user_id, batch_id, company_id) of the measured user"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+
+    company_count = max(batches * cases * 2, 1000)
+    company_rows = []
+    for i in range(company_count):
+        row = {
+            "company_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "company_name": f"Bedrijf {i} {rng.choice(['BV', 'NV', 'VOF', 'SRL'])}",
+            "company_address": f"Kerkstraat {i % 200}, {rng.choice(PLACES)}",
+            "vat_number": f"BE{i:010d}",
+            "created_at": now,
+            "quick_ratio": round(rng.uniform(0, 4), 4) if i % 5 else None,
+            "cash": rng.randint(0, 5000000),
+            "current_ratio": round(rng.uniform(0, 5), 4),
+            "solvency_ratio": round(rng.uniform(1, 80), 2),
+            "debt_ratio": round(rng.uniform(1, 99), 2),
+            "credit_score": rng.randint(1, 100),
+            "common_score": rng.choice("ABCDE"),
+        }
+        row["solvency_score"] = models.solvency_score(row["solvency_ratio"], row["debt_ratio"], row["credit_score"])
+        company_rows.append(row)
+    insert_rows(db, models.Company.__table__, company_rows)
+    company_ids = [row["company_id"] for row in company_rows]
+
+    user_ids = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(users)]
+    insert_rows(db, models.User.__table__, [
+        {"user_id": user_id, "username": f"bench{i}", "user_name": f"Bench {i}",
+         "user_email": f"bench{i}@example.com", "created_at": now}
+        for i, user_id in enumerate(user_ids)
+    ])
+
+    batch_rows = [
+        {"batch_name": f"Ronde {b}", "user_id": user_id, "created_at": now - timedelta(days=b)}
+        for user_id in user_ids for b in range(batches)
+    ]
+    insert_rows(db, models.DebtorBatch.__table__, batch_rows)
+    batch_ids = db.session.execute(
+        db.select(models.DebtorBatch.batch_id, models.DebtorBatch.user_id).order_by(models.DebtorBatch.batch_id)
+    ).all()
+
+    case_rows = []
+    for batch_id, user_id in batch_ids:
+        for company_id in rng.sample(company_ids, cases):
+            case_rows.append({"case_id": uuid.UUID(int=rng.getrandbits(128)), "company_id": company_id,
+                              "user_id": user_id, "batch_id": batch_id, "amount": 0, "status": "pending",
+                              "is_debtor": False, "created_at": now})
+    for user_id in user_ids:
+        for company_id in rng.sample(company_ids, debtors):
+            case_rows.append({"case_id": uuid.UUID(int=rng.getrandbits(128)), "company_id": company_id,
+                              "user_id": user_id, "batch_id": None, "amount": 0, "status": "pending",
+                              "is_debtor": True, "created_at": now})
+    insert_rows(db, models.Case.__table__, case_rows)
+
+    batch_id = next(batch_id for batch_id, user_id in batch_ids if user_id == user_ids[0])
+    job = models.ImportJob(batch_id=batch_id, user_id=user_ids[0], status="done", vat_numbers=[], errors=[])
+    db.session.add(job)
+    db.session.commit()
+
+    # Fresh planner statistics, as after autovacuum in production
+    db.session.execute(db.text("ANALYZE"))
+    db.session.commit()
+
+    print(f"Seeded {company_count} companies, {users} users, {len(batch_rows)} batches, {len(case_rows)} cases")
+    return user_ids[0], batch_id, company_ids[0], job.job_id
+
+
+def explain(connection, statement, parameters):
+    """Plan lines of one captured statement (EXPLAIN ANALYZE on Postgres, EXPLAIN QUERY PLAN on SQLite)"""
+    if connection.dialect.name == "postgresql":
+        rows = connection.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters)
+        return [row[0] for row in rows]
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+    return [row[-1] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Empty throw-away database (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=20, help="Number of users")
+    parser.add_argument("--batches", type=int, default=10, help="Batches per user")
+    parser.add_argument("--cases", type=int, default=250, help="Cases per batch")
+    parser.add_argument("--debtors", type=int, default=100, help="Standalone debtors per user")
+    args = parser.parse_args()
+
+    db_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'explain_queries.db')}"
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["SUGGEST_INDEX_AT_STARTUP"] = "0"
+    os.environ["PDF_CACHE_DIR"] = tempfile.mkdtemp()
+
+    from app import create_app, models
+    from app.models import db
+
+    app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        user_id, batch_id, company_id, job_id = seed(db, models, args.users, args.batches, args.cases, args.debtors)
+        engine = db.engine
+
+    with client.session_transaction() as session:
+        session["user"] = "bench0"
+        session["user_id"] = user_id
+
+    first_page = client.get(f"/batch/{batch_id}/cases?limit=50").get_json()
+    routes = {
+        "dashboard": "/dashboard?q=Bedrijf 12",
+        "dashboard_score": "/dashboard?q=Bedrijf 12&sort=score",
+        "company": f"/company/{company_id}",
+        "debtors": "/debtors",
+        "debtors_search": "/debtors?search=Bedrijf 12",
+        "add_debtor": f"/add_debtor/{company_id}",
+        "batch_detail": f"/batch/{batch_id}",
+        "batch_detail_score": f"/batch/{batch_id}?sort=score",
+        "batch_detail_balanced": f"/batch/{batch_id}?sort=balanced",
+        "batch_cases_feed": f"/batch/{batch_id}/cases?after={first_page['next_cursor']}",
+        "import_job_status": f"/import_jobs/{job_id}",
+        "export_pdf_status": f"/batch/{batch_id}/export_pdf/status",
+    }
+
+    explained = {}
+    full_scans = []
+    with engine.connect() as connection:
+        for name, url in routes.items():
+            with count_queries(engine, StatementRecorder()) as recorder:
+                response = client.get(url)
+
+            print(f"\n=== {name}  GET {url}  (HTTP {response.status_code}, {recorder.count} statements)")
+            for i, (statement, parameters) in enumerate(zip(recorder.statements, recorder.parameters), start=1):
+                if not statement.lstrip().upper().startswith("SELECT"):
+                    continue
+                summary = " ".join(statement.split())
+                print(f"--- [{i}] {summary[:160]}{'...' if len(summary) > 160 else ''}")
+                if summary in explained:
+                    print(f"    (same statement as {explained[summary]})")
+                    continue
+                explained[summary] = f"{name} [{i}]"
+
+                plan = explain(connection, statement, parameters)
+                for line in plan:
+                    print("    " + line)
+                if any(scan in line for line in plan for scan in FULL_SCANS):
+                    full_scans.append(f"{name} [{i}]")
+
+    print(f"\nStatements with a full scan of cases/companies: {', '.join(full_scans) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
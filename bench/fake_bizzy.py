@@ -0,0 +1,196 @@
+"""Local stand-in for the bizzy.ai API, for load tests without using real quota
+
+Serves /v1/companies/BE/<vat> and /v1/companies/BE/<vat>/financials from
+recorded fixtures (see BIZZY_RECORD_DIR in app/config.py) or, with --generate,
+from deterministic fake data. Latency, 5xx errors and 429 rate limiting can be
+injected to see how the app behaves under a slow or flaky API.
+
+Usage:
+    python bench/fake_bizzy.py --port 8765 --latency 150 --generate
+    BIZZY_BASE_URL=http://127.0.0.1:8765/v1 flask run
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+PATH_RE = re.compile(r"^/v1/companies/BE/(\d{9,10})(/financials)?/?$")
+
+PLACES = [
+    ("1000", "Brussel"), ("2000", "Antwerpen"), ("3000", "Leuven"), ("3500", "Hasselt"),
+    ("4000", "Liège"), ("5000", "Namur"), ("6000", "Charleroi"), ("7000", "Mons"),
+    ("8000", "Brugge"), ("8500", "Kortrijk"), ("9000", "Gent"), ("9300", "Aalst")
+]
+STREETS = ["Kerkstraat", "Stationsstraat", "Nieuwstraat", "Dorpsstraat", "Rue de la Gare", "Industrieweg"]
+REVENUE_BUCKETS = ["BucketBelow50K", "Bucket50K_250K", "Bucket250K_1M", "Bucket1M_10M", "Bucket10M_50M", "BucketAbove500M"]
+EMPLOYEE_BUCKETS = ["Bucket1_4", "Bucket5_9", "Bucket10_49", "Bucket50_199", "Bucket2000_4999"]
+
+
+# =====================================================
+# RESPONSE SOURCES
+# =====================================================
+
+def load_fixture(fixtures_dir, vat, financials):
+    """Return (status, body) from a recorded fixture, or None when there is none"""
+    filename = f"companies_BE_{vat}{'_financials' if financials else ''}.json"
+    path = os.path.join(fixtures_dir, filename)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        fixture = json.load(f)
+    return fixture["status"], fixture["body"]
+
+
+def generate_details(vat):
+    """Deterministic fake Details response for a VAT"""
+    rng = random.Random(f"details-{vat}")
+    postal, place = rng.choice(PLACES)
+    return {
+        "identifier": {"name": f"Testbedrijf {vat} BV", "vat": f"BE{vat}"},
+        "data": {
+            "address": {
+                "street": rng.choice(STREETS),
+                "number": str(rng.randint(1, 250)),
+                "box": "",
+                "postalCode": postal,
+                "place": place
+            },
+            "establishedSince": f"{rng.randint(1960, 2022)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T00:00:00Z",
+            "revenueEstimations": rng.choice(REVENUE_BUCKETS),
+            "employeeEstimations": rng.choice(EMPLOYEE_BUCKETS),
+            "commonScore": rng.choice("ABCDE"),
+            "creditLimit": rng.randint(0, 500) * 1000
+        }
+    }
+
+
+def generate_financials(vat):
+    """Deterministic fake Financials response (1 to 3 yearly accounts)"""
+    rng = random.Random(f"financials-{vat}")
+    accounts = []
+    for year in range(2023, 2023 - rng.randint(1, 3), -1):
+        total_assets = rng.randint(50, 50000) * 1000
+        equity = int(total_assets * rng.uniform(-0.2, 0.8))
+        accounts.append({
+            "startDate": f"{year}-01-01",
+            "endDate": f"{year}-12-31",
+            "healthIndicator": round(rng.uniform(0, 10), 2),
+            "profitability": {
+                "ebitda": int(total_assets * rng.uniform(-0.1, 0.3)),
+                "netProfit": int(total_assets * rng.uniform(-0.15, 0.2))
+            },
+            "liquidity": {
+                "currentRatio": round(rng.uniform(0.2, 3.5), 4),
+                "quickRatio": round(rng.uniform(0.1, 3.0), 4),
+                "cash": int(total_assets * rng.uniform(0, 0.4))
+            },
+            "solvency": {
+                "totalAssets": total_assets,
+                "equity": equity,
+                "debt": total_assets - equity
+            }
+        })
+    return {"data": accounts}
+
+
+# =====================================================
+# HTTP SERVER
+# =====================================================
+
+class FakeBizzyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        if self.server.options.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        options = self.server.options
+        rng = self.server.rng
+
+        # Simulated network + API latency
+        if options.latency:
+            time.sleep(max(0.0, rng.gauss(options.latency, options.jitter)) / 1000)
+
+        match = PATH_RE.match(self.path.split("?")[0])
+        if not match:
+            return self.send_json(404, {"error": "Not found"})
+
+        roll = rng.random()
+        if roll < options.rate_limit_rate:
+            return self.send_json(429, {"error": "Too many requests"}, {"Retry-After": str(options.retry_after)})
+        if roll < options.rate_limit_rate + options.error_rate:
+            return self.send_json(503, {"error": "Service unavailable"})
+
+        vat, financials = match.group(1), bool(match.group(2))
+        fixture = load_fixture(options.fixtures, vat, financials)
+        if fixture is not None:
+            return self.send_json(*fixture)
+
+        if options.generate:
+            return self.send_json(200, generate_financials(vat) if financials else generate_details(vat))
+
+        return self.send_json(404, {"error": f"Unknown company BE{vat}"})
+
+
+def create_server(host="127.0.0.1", port=8765, **options):
+    """Build a FakeBizzyServer; options mirror the command line flags"""
+    defaults = dict(fixtures=FIXTURES_DIR, latency=0.0, jitter=0.0, error_rate=0.0,
+                    rate_limit_rate=0.0, retry_after=1, generate=False, seed=None, verbose=False)
+    defaults.update(options)
+
+    server = ThreadingHTTPServer((host, port), FakeBizzyHandler)
+    server.options = argparse.Namespace(**defaults)
+    server.rng = random.Random(defaults["seed"])
+    return server
+
+
+def start_in_thread(**options):
+    """Start a fake server on a daemon thread (for use from benchmark scripts)"""
+    server = create_server(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Directory with recorded responses")
+    parser.add_argument("--generate", action="store_true", help="Generate data for VATs without a fixture")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Standard deviation of the latency in ms")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429 responses")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency and error injection")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    options = vars(args)
+    server = create_server(options.pop("host"), options.pop("port"), **options)
+    print(f"Fake bizzy.ai listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Query-count guard for the batch and debtor views
+
+Seeds a throw-away SQLite database with one user, a batch of many cases and
+some standalone debtors, requests each route once and fails when a route runs
+more SQL statements than its budget. Catches N+1 regressions such as touching
+case.company lazily per row.
+
+Usage:
+    python bench/query_counts.py [--cases 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# Maximum number of SQL statements per route, independent of the batch size
+QUERY_BUDGETS = {
+    "batch_detail": 6,
+    "export_batch_pdf": 6,
+    "debtors": 6,
+    "debtors_search": 7,
+}
+
+
+class QueryCounter:
+    """Counts statements executed on an engine while active"""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine, counter=None):
+    """with count_queries(db.engine) as counter: ... counter.count"""
+    from sqlalchemy import event
+
+    counter = counter or QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+def assert_max_queries(engine, client, url, budget, name):
+    """Request url and check the number of statements; returns True when within budget"""
+    with count_queries(engine) as counter:
+        response = client.get(url)
+
+    # 202: the PDF export answers with a pending page while the PDF renders in the pool
+    ok = response.status_code in (200, 202) and counter.count <= budget
+    print(f"{'OK  ' if ok else 'FAIL'} {name:<18} {counter.count:>4} queries (budget {budget}, HTTP {response.status_code})")
+    if not ok:
+        for statement in counter.statements[:10]:
+            print("       " + " ".join(statement.split())[:120])
+    return ok
+
+
+def seed(db, models, cases):
+    user = models.User(username="bench", user_name="Bench", user_email="bench@example.com")
+    db.session.add(user)
+    db.session.flush()
+
+    batch = models.DebtorBatch(batch_name="Bench batch", user_id=user.user_id)
+    db.session.add(batch)
+    db.session.flush()
+
+    for i in range(cases + 10):
+        company = models.Company(
+            company_name=f"Bench Company {i}",
+            vat_number=f"BE{i:010d}",
+            quick_ratio=(i % 37) / 10 if i % 5 else None,
+            cash=i * 1000,
+            common_score="ABCDE"[i % 5]
+        )
+        db.session.add(company)
+        db.session.flush()
+        in_batch = i < cases
+        db.session.add(models.Case(
+            company_id=company.company_id,
+            user_id=user.user_id,
+            batch_id=batch.batch_id if in_batch else None,
+            is_debtor=not in_batch
+        ))
+
+    # A few more batches for the debtors overview
+    for i in range(5):
+        db.session.add(models.DebtorBatch(batch_name=f"Extra batch {i}", user_id=user.user_id))
+
+    db.session.commit()
+    return user.user_id, batch.batch_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=200, help="Number of cases in the batch")
+    args = parser.parse_args()
+
+    db_file = os.path.join(tempfile.mkdtemp(), "query_counts.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_file}"
+    os.environ["SUGGEST_INDEX_AT_STARTUP"] = "0"
+
+    from app import create_app, models
+    from app.models import db
+
+    app = create_app()
+    client = app.test_client()
+
+    with app.app_context():
+        user_id, batch_id = seed(db, models, args.cases)
+        engine = db.engine
+
+    with client.session_transaction() as session:
+        session["user"] = "bench"
+        session["user_id"] = user_id
+
+    routes = {
+        "batch_detail": f"/batch/{batch_id}",
+        "export_batch_pdf": f"/batch/{batch_id}/export_pdf",
+        "debtors": "/debtors",
+        "debtors_search": "/debtors?search=Company",
+    }
+
+    failures = 0
+    for name, url in routes.items():
+        if name == "export_batch_pdf":
+            try:
+                import xhtml2pdf  # noqa: F401
+            except ImportError:
+                print(f"SKIP {name:<18} xhtml2pdf not installed")
+                continue
+        if not assert_max_queries(engine, client, url, QUERY_BUDGETS[name], name):
+            failures += 1
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
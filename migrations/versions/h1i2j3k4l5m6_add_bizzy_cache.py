@@ -0,0 +1,35 @@
+"""add_bizzy_cache
+
+Revision ID: h1i2j3k4l5m6
+Revises: g5h6i7j8k9l0
+Create Date: 2026-01-05 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'h1i2j3k4l5m6'
+down_revision = 'g5h6i7j8k9l0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop table if it exists (created empty by db.create_all in create_app)
+    op.execute("DROP TABLE IF EXISTS bizzy_cache")
+    
+    # Raw bizzy.ai responses, keyed by cleaned VAT (digits only)
+    op.create_table(
+        'bizzy_cache',
+        sa.Column('vat', sa.String(10), nullable=False),
+        sa.Column('details', sa.JSON(), nullable=False),
+        sa.Column('financials', sa.JSON(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('vat')
+    )
+
+
+def downgrade():
+    op.drop_table('bizzy_cache')
@@ -0,0 +1,51 @@
+"""add_import_jobs
+
+Revision ID: i2j3k4l5m6n7
+Revises: h1i2j3k4l5m6
+Create Date: 2026-01-12 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'i2j3k4l5m6n7'
+down_revision = 'h1i2j3k4l5m6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop table if it exists (create_app runs db.create_all before the upgrade)
+    op.execute("DROP TABLE IF EXISTS import_jobs")
+    
+    op.create_table(
+        'import_jobs',
+        sa.Column('job_id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('batch_id', sa.Integer(), nullable=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('vat_numbers', sa.JSON(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('processed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('succeeded', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('errors', sa.JSON(), nullable=False, server_default='[]'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('job_id'),
+        sa.ForeignKeyConstraint(['batch_id'], ['debtor_batches.batch_id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ondelete='SET NULL')
+    )
+    
+    # The worker claims the oldest queued job
+    op.create_index('ix_import_jobs_queued', 'import_jobs', ['created_at'],
+                    postgresql_where=sa.text("status = 'queued'"))
+
+
+def downgrade():
+    op.drop_index('ix_import_jobs_queued', table_name='import_jobs')
+    op.drop_table('import_jobs')
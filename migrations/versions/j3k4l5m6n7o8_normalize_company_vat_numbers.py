@@ -0,0 +1,34 @@
+"""normalize_company_vat_numbers
+
+Revision ID: j3k4l5m6n7o8
+Revises: i2j3k4l5m6n7
+Create Date: 2026-01-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'j3k4l5m6n7o8'
+down_revision = 'i2j3k4l5m6n7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # app.vat.normalize_vat stores 'BE' + 10 digits; old rows may hold the 9-digit form (BE403170701)
+    op.execute("""
+        UPDATE companies c
+        SET vat_number = 'BE0' || substr(c.vat_number, 3)
+        WHERE c.vat_number ~ '^BE[0-9]{9}$'
+          AND NOT EXISTS (
+              SELECT 1 FROM companies other
+              WHERE other.vat_number = 'BE0' || substr(c.vat_number, 3)
+          )
+    """)
+
+
+def downgrade():
+    # Data-only migration: the 10-digit form is valid for the old code too
+    pass
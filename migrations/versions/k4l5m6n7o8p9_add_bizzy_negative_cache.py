@@ -0,0 +1,36 @@
+"""add_bizzy_negative_cache
+
+Revision ID: k4l5m6n7o8p9
+Revises: j3k4l5m6n7o8
+Create Date: 2026-01-26 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'k4l5m6n7o8p9'
+down_revision = 'j3k4l5m6n7o8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Drop table if it exists (from db.create_all)
+    op.execute("DROP TABLE IF EXISTS bizzy_negative_cache")
+    
+    # Failed bizzy.ai lookups per cleaned VAT and failure reason
+    op.create_table(
+        'bizzy_negative_cache',
+        sa.Column('vat', sa.String(10), nullable=False),
+        sa.Column('reason', sa.String(30), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('vat', 'reason')
+    )
+
+
+def downgrade():
+    op.drop_table('bizzy_negative_cache')
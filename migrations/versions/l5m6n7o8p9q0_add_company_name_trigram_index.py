@@ -0,0 +1,45 @@
+"""add_company_name_trigram_index
+
+Revision ID: l5m6n7o8p9q0
+Revises: k4l5m6n7o8p9
+Create Date: 2026-02-02 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'l5m6n7o8p9q0'
+down_revision = 'k4l5m6n7o8p9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm may not be installable (no privileges); the app then falls back to plain ILIKE
+    op.execute("""
+        DO $$
+        BEGIN
+            CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        EXCEPTION WHEN insufficient_privilege OR undefined_file THEN
+            RAISE NOTICE 'pg_trgm not available, company name search uses ILIKE without index';
+        END
+        $$;
+    """)
+    
+    # GIN trigram index serves ILIKE '%...%', the % similarity operator and similarity() ranking
+    op.execute("""
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+                CREATE INDEX IF NOT EXISTS ix_companies_company_name_trgm
+                    ON companies USING gin (company_name gin_trgm_ops);
+            END IF;
+        END
+        $$;
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_companies_company_name_trgm")
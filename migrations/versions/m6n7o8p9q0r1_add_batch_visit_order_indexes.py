@@ -0,0 +1,34 @@
+"""add_batch_visit_order_indexes
+
+Revision ID: m6n7o8p9q0r1
+Revises: l5m6n7o8p9q0
+Create Date: 2026-02-09 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'm6n7o8p9q0r1'
+down_revision = 'l5m6n7o8p9q0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Cases of one batch (batch_detail, export, keyset feed)
+    op.create_index('ix_cases_batch_id', 'cases', ['batch_id'])
+    
+    # Visit order used by app/batches.py; must match QUICK_RATIO_SORT_KEY / CASH_SORT_KEY in models.py
+    op.execute("""
+        CREATE INDEX ix_companies_visit_order ON companies (
+            (coalesce(quick_ratio, -1000000)) DESC,
+            (coalesce(cash, -10000000000000)) DESC
+        )
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_companies_visit_order', table_name='companies')
+    op.drop_index('ix_cases_batch_id', table_name='cases')
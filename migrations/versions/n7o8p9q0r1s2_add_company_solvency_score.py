@@ -0,0 +1,40 @@
+"""add_company_solvency_score
+
+Revision ID: n7o8p9q0r1s2
+Revises: m6n7o8p9q0r1
+Create Date: 2026-02-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'n7o8p9q0r1s2'
+down_revision = 'm6n7o8p9q0r1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('companies', sa.Column('solvency_score', sa.Numeric(precision=10, scale=2), nullable=True))
+    
+    # Backfill; same formula as Company.computed_solvency_score in models.py
+    op.execute("""
+        UPDATE companies SET solvency_score = CASE
+            WHEN coalesce(solvency_ratio, 0) = 0 OR coalesce(debt_ratio, 0) = 0 OR coalesce(credit_score, 0) = 0 THEN NULL
+            ELSE round(solvency_ratio * 0.5 + (100 - debt_ratio) * 0.3 + (credit_score / 10) * 0.2, 2)
+        END
+    """)
+    
+    # Sort key used by the dashboard and batches; must match SOLVENCY_SORT_KEY in models.py
+    op.execute("""
+        CREATE INDEX ix_companies_solvency_score ON companies (
+            (coalesce(solvency_score, -1000000)) DESC
+        )
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_companies_solvency_score', table_name='companies')
+    op.drop_column('companies', 'solvency_score')
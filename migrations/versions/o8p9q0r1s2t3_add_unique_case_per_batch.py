@@ -0,0 +1,39 @@
+"""add_unique_case_per_batch
+
+Revision ID: o8p9q0r1s2t3
+Revises: n7o8p9q0r1s2
+Create Date: 2026-02-23 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'o8p9q0r1s2t3'
+down_revision = 'n7o8p9q0r1s2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Concurrent imports could add a company twice to a batch; keep the oldest case
+    op.execute("""
+        DELETE FROM cases WHERE case_id IN (
+            SELECT case_id FROM (
+                SELECT case_id, row_number() OVER (
+                    PARTITION BY batch_id, company_id ORDER BY created_at NULLS LAST, case_id
+                ) AS duplicate_number
+                FROM cases
+                WHERE batch_id IS NOT NULL
+            ) ranked
+            WHERE duplicate_number > 1
+        )
+    """)
+    
+    # Target of INSERT ... ON CONFLICT (batch_id, company_id) DO NOTHING in jobs.py
+    op.create_unique_constraint('uq_cases_batch_company', 'cases', ['batch_id', 'company_id'])
+
+
+def downgrade():
+    op.drop_constraint('uq_cases_batch_company', 'cases', type_='unique')
@@ -0,0 +1,37 @@
+"""add_import_job_resume
+
+Revision ID: p9q0r1s2t3u4
+Revises: o8p9q0r1s2t3
+Create Date: 2026-03-02 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'p9q0r1s2t3u4'
+down_revision = 'o8p9q0r1s2t3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('import_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.add_column('import_jobs', sa.Column('vat_hash', sa.String(40), nullable=True))
+    
+    # Jobs running right now count as alive since their start
+    op.execute("UPDATE import_jobs SET heartbeat_at = coalesce(started_at, created_at) WHERE status = 'running'")
+    
+    # The worker also claims running jobs without heartbeat (crashed worker)
+    op.drop_index('ix_import_jobs_queued', table_name='import_jobs')
+    op.create_index('ix_import_jobs_pending', 'import_jobs', ['created_at'],
+                    postgresql_where=sa.text("status IN ('queued', 'running')"))
+
+
+def downgrade():
+    op.drop_index('ix_import_jobs_pending', table_name='import_jobs')
+    op.create_index('ix_import_jobs_queued', 'import_jobs', ['created_at'],
+                    postgresql_where=sa.text("status = 'queued'"))
+    op.drop_column('import_jobs', 'vat_hash')
+    op.drop_column('import_jobs', 'heartbeat_at')
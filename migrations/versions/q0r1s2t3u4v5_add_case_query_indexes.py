@@ -0,0 +1,42 @@
+"""add_case_query_indexes
+
+Revision ID: q0r1s2t3u4v5
+Revises: p9q0r1s2t3u4
+Create Date: 2026-03-09 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'q0r1s2t3u4v5'
+down_revision = 'p9q0r1s2t3u4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Debtors page and search: all cases of a user
+    op.create_index('ix_cases_user_debtor_batch', 'cases', ['user_id', 'is_debtor', 'batch_id'])
+    
+    # Debtors page: standalone debtors of a user (a small part of all cases)
+    op.create_index('ix_cases_standalone_debtors', 'cases', ['user_id'],
+                    postgresql_where=sa.text('batch_id IS NULL AND is_debtor'))
+    
+    # Batches holding a company (PDF cache invalidation, company deletes via the FK)
+    op.create_index('ix_cases_company_batch', 'cases', ['company_id', 'batch_id'])
+    
+    # Batches of a user, newest first
+    op.create_index('ix_debtor_batches_user_created', 'debtor_batches', ['user_id', sa.text('created_at DESC')])
+    
+    # uq_cases_batch_company (batch_id, company_id) serves every batch_id lookup
+    op.drop_index('ix_cases_batch_id', table_name='cases')
+
+
+def downgrade():
+    op.create_index('ix_cases_batch_id', 'cases', ['batch_id'])
+    op.drop_index('ix_debtor_batches_user_created', table_name='debtor_batches')
+    op.drop_index('ix_cases_company_batch', table_name='cases')
+    op.drop_index('ix_cases_standalone_debtors', table_name='cases')
+    op.drop_index('ix_cases_user_debtor_batch', table_name='cases')
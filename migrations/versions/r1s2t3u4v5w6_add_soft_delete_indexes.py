@@ -0,0 +1,81 @@
+"""add_soft_delete_indexes
+
+Revision ID: r1s2t3u4v5w6
+Revises: q0r1s2t3u4v5
+Create Date: 2026-03-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'r1s2t3u4v5w6'
+down_revision = 'q0r1s2t3u4v5'
+branch_labels = None
+depends_on = None
+
+
+LIVE = sa.text('deleted_at IS NULL')
+DELETED = sa.text('deleted_at IS NOT NULL')
+
+
+def upgrade():
+    # Queries only read live rows now (deleted_at IS NULL, models.hide_deleted_rows):
+    # the indexes they use leave deleted rows out
+    op.drop_constraint('uq_cases_batch_company', 'cases', type_='unique')
+    op.create_index('uq_cases_batch_company', 'cases', ['batch_id', 'company_id'],
+                    unique=True, postgresql_where=LIVE)
+    
+    op.drop_index('ix_cases_user_debtor_batch', table_name='cases')
+    op.create_index('ix_cases_user_debtor_batch', 'cases', ['user_id', 'is_debtor', 'batch_id'],
+                    postgresql_where=LIVE)
+    
+    op.drop_index('ix_cases_standalone_debtors', table_name='cases')
+    op.create_index('ix_cases_standalone_debtors', 'cases', ['user_id'],
+                    postgresql_where=sa.text('batch_id IS NULL AND is_debtor AND deleted_at IS NULL'))
+    
+    op.drop_index('ix_debtor_batches_user_created', table_name='debtor_batches')
+    op.create_index('ix_debtor_batches_user_created', 'debtor_batches', ['user_id', sa.text('created_at DESC')],
+                    postgresql_where=LIVE)
+    
+    # The unique index no longer covers deleted cases; purging a batch sets their batch_id to NULL via the FK
+    op.create_index('ix_cases_batch_id', 'cases', ['batch_id'])
+    
+    # Expired rows for the purge job (flask purge-deleted)
+    op.create_index('ix_cases_deleted_at', 'cases', ['deleted_at'], postgresql_where=DELETED)
+    op.create_index('ix_debtor_batches_deleted_at', 'debtor_batches', ['deleted_at'], postgresql_where=DELETED)
+    op.create_index('ix_companies_deleted_at', 'companies', ['deleted_at'], postgresql_where=DELETED)
+
+
+def downgrade():
+    op.drop_index('ix_companies_deleted_at', table_name='companies')
+    op.drop_index('ix_debtor_batches_deleted_at', table_name='debtor_batches')
+    op.drop_index('ix_cases_deleted_at', table_name='cases')
+    op.drop_index('ix_cases_batch_id', table_name='cases')
+    
+    op.drop_index('ix_debtor_batches_user_created', table_name='debtor_batches')
+    op.create_index('ix_debtor_batches_user_created', 'debtor_batches', ['user_id', sa.text('created_at DESC')])
+    
+    op.drop_index('ix_cases_standalone_debtors', table_name='cases')
+    op.create_index('ix_cases_standalone_debtors', 'cases', ['user_id'],
+                    postgresql_where=sa.text('batch_id IS NULL AND is_debtor'))
+    
+    op.drop_index('ix_cases_user_debtor_batch', table_name='cases')
+    op.create_index('ix_cases_user_debtor_batch', 'cases', ['user_id', 'is_debtor', 'batch_id'])
+    
+    # A re-added debtor has a deleted twin in the same batch; keep the live case
+    op.execute("""
+        DELETE FROM cases WHERE case_id IN (
+            SELECT case_id FROM (
+                SELECT case_id, row_number() OVER (
+                    PARTITION BY batch_id, company_id ORDER BY deleted_at DESC NULLS FIRST, case_id
+                ) AS duplicate_number
+                FROM cases
+                WHERE batch_id IS NOT NULL
+            ) ranked
+            WHERE duplicate_number > 1
+        )
+    """)
+    op.drop_index('uq_cases_batch_company', table_name='cases')
+    op.create_unique_constraint('uq_cases_batch_company', 'cases', ['batch_id', 'company_id'])